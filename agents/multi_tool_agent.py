@@ -2,17 +2,22 @@
 import os
 import sys
 import re
-import json
+import queue
+import random
 import logging
+import threading
+import contextvars
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Union, Optional, Any
+from typing import Callable, Iterator, List, Dict, Union, Optional, Any
+from uuid import UUID
 
 from langchain.tools import Tool
 from langchain.agents import AgentExecutor, create_react_agent
+from langchain_core.agents import AgentAction
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -27,10 +32,20 @@ if str(project_root) not in sys.path:
 # ────────────────────────────────────────────────────────────────────────────────
 # Retriever imports
 # ────────────────────────────────────────────────────────────────────────────────
-from src.retrievers.sql_retriever import get_sql_agent
+from src.retrievers.sql_retriever import get_sql_retriever
+from src.retrievers.sql_templates import answer_from_template
+from src.retrievers.sql_guard import collect_results
+from src.retrievers.cache import trace_cache_lookups
 from src.retrievers.vector_retriever import get_vector_retriever
 from src.retrievers.graph_retriever import get_graph_retriever
+from src.retrievers.highlight_alignment import align_answer
 from tools.rag_tool import create_rag_tool  # RAG tool factory
+from src.llm.llm_client import get_llm
+from src.llm.usage_tracker import track_llm_usage, usage_callback
+from src.observability.log_writer import get_log_writer
+from src.observability.metrics_registry import (
+    ERRORS, FIRST_TOKEN_LATENCY, REQUESTS, REQUEST_LATENCY, REQUESTS_IN_PROGRESS, start_metrics_exporters,
+)
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Logging setup
@@ -41,18 +56,21 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-jsonl_logger = logging.getLogger("jsonl_logger")
-jsonl_logger.setLevel(logging.INFO)
-jsonl_handler = logging.FileHandler("ui/agent_calls.log")
-jsonl_handler.setFormatter(logging.Formatter("%(message)s"))
-jsonl_logger.addHandler(jsonl_handler)
-jsonl_logger.propagate = False
+# Per-request call log: queued and written by a background thread (see
+# src/observability/log_writer.py). The raw agent response is only kept for a
+# sampled fraction of requests.
+jsonl_logger = get_log_writer(os.path.join(project_root, "ui", "agent_calls.log"))
+RAW_RESPONSE_SAMPLE_RATE = float(os.getenv("COMPASS_LOG_RAW_SAMPLE_RATE", "0"))
+
+# Prometheus metrics: http://127.0.0.1:9464/metrics by default (COMPASS_METRICS_PORT,
+# COMPASS_METRICS_TEXTFILE; see src/observability/metrics_registry.py)
+start_metrics_exporters()
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Retriever singletons
 # ────────────────────────────────────────────────────────────────────────────────
-sql_agent_executor = get_sql_agent()
+sql_retriever_func = get_sql_retriever()
 vector_retriever_func = get_vector_retriever()
 graph_retriever_func = get_graph_retriever()
 
@@ -71,7 +89,7 @@ def create_tools(llm) -> List[Tool]:
     tools: List[Tool] = []
 
     # SQL tool
-    if sql_agent_executor:
+    if sql_retriever_func:
         tools.append(
             Tool(
                 name="sql_search",
@@ -80,9 +98,7 @@ def create_tools(llm) -> List[Tool]:
                     "Use this tool to get specific information, lookup details, or answer questions " 
                     "related to individual records or aggregates from the SQL (DuckDB) database." 
                 ),
-                func=lambda q: sql_agent_executor.invoke(
-                    {"input": _clean_query_input(q)}
-                )["output"],
+                func=lambda q: sql_retriever_func(_clean_query_input(q)),
             )
         )
 
@@ -176,10 +192,72 @@ Question: {input}
         prompt=prompt,
     )
 
-    return AgentExecutor(agent=agent, tools=tools, verbose=True)
+    # Intermediate steps are returned so answers can be aligned with what the tools retrieved
+    return AgentExecutor(agent=agent, tools=tools, verbose=True, callbacks=[usage_callback],
+                         return_intermediate_steps=True)
 
 
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Streaming events
+#
+# While the agent runs, UI events are produced from its callbacks:
+#   {"type": "tool", "tool", "input"}          the agent decided to call a tool
+#   {"type": "observation", "tool", "preview"} the tool returned (first chars)
+#   {"type": "token", "text"}                  a piece of the final answer
+# and stream_agent_with_logging ends with {"type": "result", "result"}, the dict
+# run_agent_with_logging returns (answer, highlights, tables, status).
+# ────────────────────────────────────────────────────────────────────────────────
+FINAL_ANSWER_MARKER = "Final Answer:"
+OBSERVATION_PREVIEW_CHARS = 300
+
+
+class AgentEventHandler(BaseCallbackHandler):
+    """
+    Forwards tool calls, observations and final-answer tokens to `emit`.
+
+    The ReAct LLM output is "Thought: ... Action: ..." for tool steps and
+    "Thought: ... Final Answer: ..." for the last one, so tokens of each LLM
+    run are held back until the marker shows up; everything after it is
+    forwarded as it arrives.
+    """
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None]):
+        self.emit = emit
+        self._held: Dict[UUID, str] = {}  # LLM run -> output before the marker
+        self._answering: Dict[UUID, bool] = {}  # LLM run -> answer text started
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        if run_id not in self._answering:
+            held = self._held.get(run_id, "") + token
+            at = held.find(FINAL_ANSWER_MARKER)
+            if at == -1:
+                self._held[run_id] = held
+                return
+            del self._held[run_id]
+            self._answering[run_id] = False
+            token = held[at + len(FINAL_ANSWER_MARKER):]
+        if not self._answering[run_id]:
+            token = token.lstrip()
+            self._answering[run_id] = bool(token)
+        if token:
+            self.emit({"type": "token", "text": token})
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._held.pop(run_id, None)
+        self._answering.pop(run_id, None)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self.on_llm_end(None, run_id=run_id)
+
+    def on_agent_action(self, action: AgentAction, **kwargs: Any):
+        self.emit({"type": "tool", "tool": action.tool, "input": str(action.tool_input)})
+
+    def on_tool_end(self, output: Any, **kwargs: Any):
+        self.emit({"type": "observation", "tool": kwargs.get("name"),
+                   "preview": str(output)[:OBSERVATION_PREVIEW_CHARS]})
+
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Driver with logging for UI
 # ────────────────────────────────────────────────────────────────────────────────
@@ -189,15 +267,42 @@ def run_agent_with_logging(
     domain: str,
     source: str, # THIS IS THE KEY PARAMETER FOR ROUTING
     unstructured_data: Optional[List[Dict]] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
 ) -> Dict[str, Any]:
+    """
+    Answers a query with the agent and logs the call.
+
+    Args:
+        on_event (callable, optional): Receives streaming events (tool calls,
+            observations, final-answer tokens) while the agent runs; see
+            stream_agent_with_logging.
+
+    Returns:
+        dict: answer, source_highlights, tables and status.
+    """
     unstructured_data = unstructured_data or []
     start = datetime.now()
+    first_token_time: Optional[float] = None
+    if on_event is not None:
+        emit_event = on_event
+
+        def on_event(event: Dict[str, Any]):
+            nonlocal first_token_time
+            if first_token_time is None and event["type"] == "token":
+                first_token_time = (datetime.now() - start).total_seconds()
+            emit_event(event)
     final_output = "No output generated."
     agent_response: Optional[dict] = None
     agent_input: Optional[dict] = None
     source_highlights: List[Dict[str, str]] = []
     tool_counts: Dict[str, int] = {}
     used_tool = None
+    llm_usage: Dict[str, Any] = {}
+    fast_path = None
+    sql_results = []
+    status = "ok"
+    cache_lookups: Dict[str, Dict[str, int]] = {}
+    REQUESTS_IN_PROGRESS.inc()
 
     try:
         # (ROUTING LOGIC) 
@@ -222,13 +327,27 @@ def run_agent_with_logging(
 
         # --- END MODIFICATION IN MULTI_TOOL_AGENT.PY (ROUTING LOGIC) ---
 
-        # Safe execution
-        agent_response = agent.invoke(agent_input)
+        # SQL results (Arrow tables) produced while answering are collected for the UI;
+        # cache hits / misses during this request are counted for the call log
+        with collect_results() as sql_results, trace_cache_lookups() as cache_lookups:
+            # Deterministic SQL fast path: answer template-shaped lookups without the LLM
+            template_answer = answer_from_template(query) if used_tool == "sql_search" else None
+            if template_answer is not None:
+                fast_path = "sql_template"
+                agent_response = {"input": query, "output": template_answer}
+                if on_event is not None:
+                    on_event({"type": "token", "text": template_answer})
+            else:
+                # Safe execution (callbacks passed via config so tool runs are timed too)
+                callbacks = [usage_callback] + ([AgentEventHandler(on_event)] if on_event is not None else [])
+                with track_llm_usage() as usage:
+                    try:
+                        agent_response = agent.invoke(agent_input, config={"callbacks": callbacks})
+                    finally:
+                        llm_usage = usage.to_dict()
         final_output = agent_response.get("output", final_output)
-
-        # ── DEBUG: Print agent_response ──
-        print("--- DEBUG: agent_response ---")
-        print(json.dumps(agent_response, indent=2, default=str))
+        if isinstance(final_output, str) and final_output.startswith("Agent stopped due to"):
+            status = "timeout"  # AgentExecutor hit its iteration / time limit
 
         # ── TOOL USAGE TRACKING ──
         # If intermediate_steps are present, extract tool usage from them
@@ -274,68 +393,121 @@ def run_agent_with_logging(
                 logging.info(f"Tool parsed from output: {tool_used}")
 
         # ── SOURCE HIGHLIGHTS ──
-        if "intermediate_steps" in agent_response:
-            for step in agent_response["intermediate_steps"]:
-                if len(step) > 0:
-                    tool_name = step[0].tool_name if hasattr(step[0], 'tool_name') else None
-                    observation = step[1]
-                    if isinstance(observation, str) and "Source:" in observation:
-                        source_text = observation.split("Source:")[1].strip()
-                        relevant_text_in_answer = _extract_relevant_text(
-                            final_output, observation
-                        )
-                        source_highlights.append({
-                            "text": relevant_text_in_answer,
-                            "source": source_text
-                        })
+        # Answer sentences supported by the retrieved passages (or the selected
+        # document), with character offsets into the answer and the passage
+        passages = _retrieved_passages(agent_response.get("intermediate_steps", []), unstructured_data)
+        if isinstance(final_output, str):
+            for alignment in align_answer(final_output, [text for _, text in passages]):
+                label, text = passages[alignment.passage]
+                source_highlights.append({
+                    "text": final_output[alignment.answer_start:alignment.answer_end],
+                    "start": alignment.answer_start,
+                    "end": alignment.answer_end,
+                    "source": text[alignment.source_start:alignment.source_end],
+                    "source_label": label,
+                    "source_start": alignment.source_start,
+                    "source_end": alignment.source_end,
+                    "score": round(alignment.score, 3),
+                })
 
     except Exception as e:
         final_output = f"Agent failed to answer: {e}"
+        status = "timeout" if isinstance(e, TimeoutError) else "error"
         logging.error(f"Agent execution error: {e}")
 
-    # ── JSONL logging ──
-    log_entry: Dict[str, Union[str, float, Dict[str, int]]] = {
+    # ── Prometheus metrics ──
+    response_time = (datetime.now() - start).total_seconds()
+    route = fast_path or next(iter(tool_counts), None) or used_tool or "agent"
+    REQUESTS_IN_PROGRESS.dec()
+    REQUESTS.inc(route=route, status=status)
+    REQUEST_LATENCY.observe(response_time, route=route)
+    if first_token_time is not None:
+        FIRST_TOKEN_LATENCY.observe(first_token_time, route=route)
+    if status == "error":
+        ERRORS.inc(component="agent")
+
+    # ── JSONL logging (compact; serialized off the request thread) ──
+    log_entry: Dict[str, Any] = {
         "timestamp": start.isoformat(),
         "query": query,
         "domain": domain,
         "source": source,
         "final_answer": final_output,
-        "response_time": (datetime.now() - start).total_seconds(),
-        "agent_raw_response": agent_response,
+        "response_time": response_time,
+        "first_token_time": first_token_time,
         "tool_usage": tool_counts,
+        "llm_usage": llm_usage,
+        "fast_path": fast_path,
+        "status": status,
+        "cache": cache_lookups,
     }
-    jsonl_logger.info(json.dumps(log_entry, ensure_ascii=False))
+    if agent_response is not None and random.random() < RAW_RESPONSE_SAMPLE_RATE:
+        log_entry["agent_raw_response"] = agent_response
+    jsonl_logger.info(log_entry)
 
     # print("DEBUG source_highlights:", source_highlights)
 
-    return {"answer": final_output, "source_highlights": source_highlights}
+    tables = [{"sql": result.sql, "table": result.table, "total_rows": result.total_rows} for result in sql_results]
+    return {"answer": final_output, "source_highlights": source_highlights, "tables": tables, "status": status}
 
-def _extract_relevant_text(answer: str, observation: str) -> str:
-    """
-    Extract the most similar sentence from the answer based on RAG observation text.
-    """
-    from difflib import SequenceMatcher
-    import re
 
-    # Extract source sentence (after "Source:")
-    content_part = observation.split("Source:")[-1].strip()
-
-    # Split answer into sentences
-    sentences = re.split(r'(?<=[.!?]) +', answer.strip())
-
-    best_score = 0.0
-    best_match = ""
-    for sentence in sentences:
-        score = SequenceMatcher(None, sentence.lower(), content_part.lower()).ratio()
-        print(f"[MATCH DEBUG] Score: {score:.3f} | Sentence: {sentence}")
-        if score > best_score:
-            best_score = score
-            best_match = sentence
-
-    if best_score < 0.4:
-        print("[WARNING] No good match found for source highlight.")
+def stream_agent_with_logging(
+    agent: AgentExecutor,
+    query: str,
+    domain: str,
+    source: str,
+    unstructured_data: Optional[List[Dict]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming mode of run_agent_with_logging: yields tool events and final-answer
+    tokens as they arrive, then {"type": "result", "result": <answer dict>}.
 
-    return best_match.strip()
+    The agent runs on a worker thread (in a copy of the caller's context) and
+    hands events over through a queue. If the consumer stops early, the run
+    still completes and is logged.
+    """
+    events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+
+    def run():
+        try:
+            result = run_agent_with_logging(agent, query, domain, source, unstructured_data, on_event=events.put)
+            events.put({"type": "result", "result": result})
+        finally:
+            events.put(None)
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name="compass-agent-stream", daemon=True).start()
+    while True:
+        event = events.get()
+        if event is None:
+            return
+        yield event
+
+def _retrieved_passages(intermediate_steps: List, unstructured_data: List[Dict]) -> List[tuple]:
+    """
+    Collects (label, text) passages to align the answer with: tool observations
+    (the part after "Source:" for the RAG tool, each hit's content for vector
+    search) and the fields of the selected source document.
+    """
+    passages = []
+    for step in intermediate_steps:
+        if not isinstance(step, (list, tuple)) or len(step) < 2:
+            continue
+        tool_name = getattr(step[0], "tool", "tool")
+        observation = step[1]
+        if isinstance(observation, list):
+            for hit in observation:
+                if isinstance(hit, dict) and hit.get("content"):
+                    passages.append((hit.get("filename") or tool_name, hit["content"]))
+        elif isinstance(observation, str) and "Source:" in observation:
+            passages.append((tool_name, observation.split("Source:")[-1].strip()))
+        elif observation:
+            passages.append((tool_name, str(observation)))
+    for doc in unstructured_data:
+        for field in ("subject", "body", "content"):
+            if doc.get(field):
+                passages.append((doc.get("filename") or field, doc[field]))
+    return passages
 
 
 
@@ -343,9 +515,7 @@ def _extract_relevant_text(answer: str, observation: str) -> str:
 # Quick CLI test
 # ────────────────────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    from langchain_google_genai import ChatGoogleGenerativeAI
-
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
+    llm = get_llm()
     rag = create_rag_tool(llm)
 
     test_input = {
@@ -0,0 +1,278 @@
+# dashboards/log_rollup.py
+
+import os
+import gzip
+import json
+import time
+import atexit
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Incremental dashboard rollup of the JSONL call log (ui/agent_calls.log).
+#
+# Only lines appended since the last refresh are parsed, and only the fields
+# the dashboard uses are kept, as flat columns (no answers, no raw agent
+# responses). Rotation by src/observability/log_writer.py is followed: the file
+# being tailed is recognised by a hash of its first line, so after it has been
+# rotated to agent_calls.log.N.gz the rest of it is read from there, followed by
+# any newer backups and the new active file.
+#
+# The rollup and the read position are saved next to the log (Parquet + JSON),
+# so a restart resumes where it stopped instead of re-reading every backup.
+# ────────────────────────────────────────────────────────────────────────────────
+ROLLUP_VERSION = 2  # bump when the columns change; saved rollups of other versions are rebuilt
+SAVE_INTERVAL_SECONDS = float(os.getenv("COMPASS_LOG_ROLLUP_SAVE_SECONDS", "30"))
+
+_HEAD_BYTES = 64 * 1024
+
+
+def _status(entry: Dict[str, Any]) -> str:
+    # Entries written before "status" was logged: infer it from the answer text.
+    if entry.get("status"):
+        return entry["status"]
+    answer = entry.get("final_answer") or ""
+    if answer.startswith("Agent failed to answer"):
+        return "error"
+    if answer.startswith("Agent stopped due to"):
+        return "timeout"
+    return "ok"
+
+
+def flatten_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduces one log entry to the flat dashboard columns.
+    """
+    tool_usage = entry.get("tool_usage") or {}
+    row: Dict[str, Any] = {
+        "timestamp": entry.get("timestamp"),
+        "domain": entry.get("domain"),
+        "source": entry.get("source"),
+        "fast_path": entry.get("fast_path"),
+        "status": _status(entry),
+        "response_time": entry.get("response_time"),
+        "first_token_time": entry.get("first_token_time"),
+        "tool": next(iter(tool_usage), None),
+        # Tool counts kept as a compact JSON string: few distinct values, so
+        # totals are computed per distinct value rather than per row.
+        "tool_usage": json.dumps(tool_usage, sort_keys=True, separators=(",", ":")) if tool_usage else None,
+    }
+    usage = entry.get("llm_usage") or {}
+    if usage:
+        row["llm_calls"] = usage.get("calls", 0)
+        row["llm_errors"] = usage.get("errors", 0)
+        row["llm_prompt_tokens"] = usage.get("prompt_tokens", 0)
+        row["llm_completion_tokens"] = usage.get("completion_tokens", 0)
+        row["llm_latency"] = usage.get("llm_latency", 0.0)
+        for component, chars in (usage.get("prompt_chars") or {}).items():
+            row[f"prompt_chars.{component}"] = chars
+    for cache, counts in (entry.get("cache") or {}).items():
+        row[f"cache.{cache}.hits"] = counts.get("hits", 0)
+        row[f"cache.{cache}.misses"] = counts.get("misses", 0)
+    return row
+
+
+def _to_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    frame = pd.DataFrame(rows)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], errors="coerce", format="ISO8601")
+    return frame
+
+
+def _head(f) -> Optional[str]:
+    # Identity of a log file: hash of its first complete line.
+    line = f.readline(_HEAD_BYTES)
+    return hashlib.sha1(line).hexdigest() if line.endswith(b"\n") else None
+
+
+class LogRollup:
+    """
+    Tail reader + columnar rollup for one JSONL log file.
+
+    `frame()` returns every entry read so far as a DataFrame of dashboard
+    columns, after parsing only what was appended since the previous call.
+    `version` changes whenever new rows arrive, so derived results can be
+    cached against it.
+    """
+
+    def __init__(self, log_file: str, rollup_path: Optional[str] = None,
+                 save_interval: float = SAVE_INTERVAL_SECONDS):
+        self.log_file = os.path.abspath(log_file)
+        self.rollup_path = rollup_path or f"{self.log_file}.rollup.parquet"
+        self.state_path = f"{os.path.splitext(self.rollup_path)[0]}.json"
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._head: Optional[str] = None
+        self._offset = 0
+        self._frame = pd.DataFrame()
+        self._chunks: List[pd.DataFrame] = []
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        self.version = 0
+        self.rows = 0
+        self._restore()
+
+    # ── Persistence ──
+    def _restore(self):
+        if not (os.path.exists(self.rollup_path) and os.path.exists(self.state_path)):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != ROLLUP_VERSION:
+                return
+            self._frame = pd.read_parquet(self.rollup_path)
+            self._head, self._offset = state.get("head"), state.get("offset", 0)
+            self.rows = len(self._frame)
+            self.version = 1
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable log rollup {self.rollup_path}: {e}")
+            self._frame, self._head, self._offset, self.rows = pd.DataFrame(), None, 0, 0
+
+    def save(self):
+        """
+        Writes the rollup and the read position (atomically, via temp files).
+        """
+        with self._lock:
+            frame = self._combined()
+            head, offset = self._head, self._offset
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        try:
+            frame.to_parquet(self.rollup_path + ".tmp", index=False)
+            with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": ROLLUP_VERSION, "head": head, "offset": offset}, f)
+            os.replace(self.rollup_path + ".tmp", self.rollup_path)
+            os.replace(self.state_path + ".tmp", self.state_path)
+        except Exception as e:
+            logging.warning(f"Could not save log rollup {self.rollup_path}: {e}")
+
+    # ── Tailing ──
+    def _backups(self) -> List[str]:
+        # Newest first: agent_calls.log.1.gz, .2.gz, ...
+        backups, index = [], 1
+        while os.path.exists(f"{self.log_file}.{index}.gz"):
+            backups.append(f"{self.log_file}.{index}.gz")
+            index += 1
+        return backups
+
+    def _read_sealed(self, path: str, offset: int) -> Tuple[List[bytes], Optional[str], int]:
+        with gzip.open(path, "rb") as f:
+            head = _head(f)
+            f.seek(offset)
+            data = f.read()
+        return data.splitlines(), head, offset + len(data)
+
+    def _read_new_lines(self) -> List[bytes]:
+        lines: List[bytes] = []
+        active_head = None
+        try:
+            with open(self.log_file, "rb") as f:
+                active_head = _head(f)
+                if active_head is not None and active_head == self._head:
+                    size = os.fstat(f.fileno()).st_size
+                    if size >= self._offset:
+                        # Common case: same file, read the appended complete lines.
+                        f.seek(self._offset)
+                        data = f.read()
+                        end = data.rfind(b"\n") + 1
+                        self._offset += end
+                        return data[:end].splitlines()
+        except FileNotFoundError:
+            pass
+
+        # The tracked file was rotated (or this is the first read): finish it
+        # from its backup, then read newer backups and the active file in order.
+        backups = self._backups()
+        heads = {}
+        for path in backups:
+            with gzip.open(path, "rb") as f:
+                heads[path] = _head(f)
+        tracked = next((path for path in backups if self._head is not None and heads[path] == self._head), None)
+        if tracked:
+            pending = backups[:backups.index(tracked)]
+        elif self._head is not None and active_head == self._head:
+            pending = []  # truncated in place rather than rotated: only the active file is new
+        else:
+            pending = backups  # first read, or the tracked file is gone: every backup is new
+        ends = {}
+        if tracked:
+            new_lines, _, ends[tracked] = self._read_sealed(tracked, self._offset)
+            lines.extend(new_lines)
+        for path in reversed(pending):
+            new_lines, _, ends[path] = self._read_sealed(path, 0)
+            lines.extend(new_lines)
+
+        if active_head is not None:
+            with open(self.log_file, "rb") as f:
+                data = f.read()
+            end = data.rfind(b"\n") + 1
+            lines.extend(data[:end].splitlines())
+            self._head, self._offset = active_head, end
+        elif backups and backups[0] in ends:
+            # No active file yet: keep tracking the newest backup, now fully read.
+            self._head, self._offset = heads[backups[0]], ends[backups[0]]
+        elif not backups:
+            self._head, self._offset = None, 0
+        return lines
+
+    def refresh(self) -> int:
+        """
+        Parses lines appended since the last refresh.
+
+        Returns:
+            int: Number of new rows.
+        """
+        with self._lock:
+            rows = []
+            for line in self._read_new_lines():
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(flatten_entry(json.loads(line)))
+                except (ValueError, AttributeError):
+                    logging.error(f"Skipping invalid JSON line in log file: {line[:200]!r}")
+            if rows:
+                self._chunks.append(_to_frame(rows))
+                self.rows += len(rows)
+                self.version += 1
+                self._dirty = True
+            save = self._dirty and time.monotonic() - self._saved_at >= self.save_interval
+        if save:
+            self.save()
+        return len(rows)
+
+    def _combined(self) -> pd.DataFrame:
+        if self._chunks:
+            frames = [frame for frame in [self._frame] + self._chunks if not frame.empty]
+            self._frame = pd.concat(frames, ignore_index=True, sort=False) if len(frames) > 1 else frames[0]
+            self._chunks = []
+        return self._frame
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Refreshes and returns all rows (a shallow copy; add columns freely).
+        """
+        self.refresh()
+        with self._lock:
+            frame = self._combined().copy(deep=False)
+            frame.attrs["rollup_key"] = f"{self.log_file}:{self.version}"
+            return frame
+
+    def close(self):
+        if self._dirty:
+            self.save()
+
+
+@lru_cache(maxsize=None)
+def get_log_rollup(log_file: str) -> LogRollup:
+    """
+    Returns the process-wide rollup for `log_file` (saved again at exit).
+    """
+    rollup = LogRollup(log_file)
+    atexit.register(rollup.close)
+    return rollup
@@ -6,10 +6,25 @@ import datetime
 import os
 import logging
 import json # NEW: Import json
+import sys
+import functools
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# Parsed rows are cached per process by the incremental rollup (dashboards/log_rollup.py);
+# each call only parses the lines appended since the previous one.
+from dashboards.log_rollup import get_log_rollup
 
 def load_logs(log_file: str = "ui/agent_calls.log") -> pd.DataFrame: # Corrected path
     """
-    Loads agent call logs from a JSONL file into a pandas DataFrame.
+    Loads agent call logs into a pandas DataFrame of dashboard columns.
+
+    Only lines appended since the previous call are parsed (rotated, gzip'd
+    backups are followed), and only the fields the dashboard uses are kept:
+    timestamp, domain, source, fast_path, response_time, tool, tool_usage
+    (JSON string), llm_* totals and prompt_chars.<component>.
 
     Args:
         log_file (str, optional): The name of the log file. Defaults to "ui/agent_calls.log".
@@ -23,49 +38,61 @@ def load_logs(log_file: str = "ui/agent_calls.log") -> pd.DataFrame: # Corrected
     project_root = os.path.abspath(os.path.join(script_dir, '..')) # Go up to allyin-compass
     log_file_path = os.path.join(project_root, log_file) # Construct full path
 
-    if not os.path.exists(log_file_path) or os.path.getsize(log_file_path) == 0:
-        logging.warning(f"Log file '{log_file_path}' not found or is empty. Returning empty DataFrame.")
-        return pd.DataFrame()
-
-    data = []
     try:
-        with open(log_file_path, "r") as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    data.append(record)
-                except json.JSONDecodeError:
-                    logging.error(f"Skipping invalid JSON line in log file: {line.strip()}")
-        df = pd.DataFrame(data)
-        if not df.empty:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-        return df
+        df = get_log_rollup(log_file_path).frame()
     except Exception as e:
         logging.error(f"An error occurred while loading logs from {log_file_path}: {e}")
         return pd.DataFrame()
+    if df.empty:
+        logging.warning(f"Log file '{log_file_path}' not found or is empty. Returning empty DataFrame.")
+    return df
+
+# Metric results are memoized per rollup version (load_logs tags the frame with
+# it), so Streamlit reruns without new log lines don't recompute anything.
+_metric_cache = {}
 
+def _rollup_cached(fn):
+    @functools.wraps(fn)
+    def wrapper(df: pd.DataFrame, *args, **kwargs):
+        key = df.attrs.get("rollup_key")
+        if key is None:
+            return fn(df, *args, **kwargs)
+        cache_key = (fn.__name__, key, args, tuple(sorted(kwargs.items())))
+        if cache_key not in _metric_cache:
+            if len(_metric_cache) >= 256:
+                _metric_cache.clear()
+            _metric_cache[cache_key] = fn(df, *args, **kwargs)
+        return _metric_cache[cache_key]
+    return wrapper
+
+@_rollup_cached
 def calculate_queries_per_day(df: pd.DataFrame) -> pd.Series:
     """
     Calculates the number of queries per day from the log data.
     """
     if df.empty:
         return pd.Series()
-    df['date'] = df['timestamp'].dt.date
-    return df.groupby('date').size()
+    # Group on day-floored timestamps (vectorized), then label the days as dates
+    counts = df.groupby(df['timestamp'].dt.floor('D')).size()
+    counts.index = counts.index.date
+    return counts
 
+@_rollup_cached
 def calculate_tool_usage(df: pd.DataFrame) -> pd.Series:
     if df.empty or 'tool_usage' not in df.columns:
         return pd.Series()
 
+    # One JSON decode per distinct tool_usage value, weighted by how often it occurs
     tool_counts = {}
-    for usage_dict in df['tool_usage'].dropna():
-        for tool_name, count in usage_dict.items():
-            tool_counts[tool_name] = tool_counts.get(tool_name, 0) + count
+    for usage_json, occurrences in df['tool_usage'].value_counts().items():
+        for tool_name, count in json.loads(usage_json).items():
+            tool_counts[tool_name] = tool_counts.get(tool_name, 0) + count * occurrences
 
-    tool_series = pd.Series(tool_counts)
+    tool_series = pd.Series(tool_counts, dtype="int64")
     return tool_series.sort_values(ascending=False)
 
 
+@_rollup_cached
 def calculate_avg_response_time(df: pd.DataFrame) -> float:
     """
     Calculates the average response time for the agent.
@@ -74,3 +101,146 @@ def calculate_avg_response_time(df: pd.DataFrame) -> float:
         return 0.0
     return df['response_time'].mean()
 
+
+@_rollup_cached
+def calculate_llm_usage(df: pd.DataFrame) -> dict:
+    """
+    Aggregates the per-request LLM accounting ('llm_*' columns) written by the agent.
+
+    Returns:
+        dict: Totals and per-query averages for LLM calls, tokens and LLM latency.
+              Returns an empty dict if no request has usage data yet.
+    """
+    if df.empty or 'llm_calls' not in df.columns:
+        return {}
+    usage = df[df['llm_calls'].notna()]
+    if usage.empty:
+        return {}
+    totals = {
+        'queries': len(usage),
+        'calls': int(usage['llm_calls'].sum()),
+        'prompt_tokens': int(usage['llm_prompt_tokens'].sum()),
+        'completion_tokens': int(usage['llm_completion_tokens'].sum()),
+        'llm_latency': float(usage['llm_latency'].sum()),
+    }
+    totals['avg_calls'] = totals['calls'] / totals['queries']
+    totals['avg_prompt_tokens'] = totals['prompt_tokens'] / totals['queries']
+    totals['avg_completion_tokens'] = totals['completion_tokens'] / totals['queries']
+    return totals
+
+
+@_rollup_cached
+def calculate_prompt_components(df: pd.DataFrame) -> pd.Series:
+    """
+    Sums prompt size (characters) per prompt component across all logged requests.
+    """
+    columns = [column for column in df.columns if column.startswith('prompt_chars.')]
+    if df.empty or not columns:
+        return pd.Series()
+    components = df[columns].sum()
+    components.index = [column[len('prompt_chars.'):] for column in columns]
+    return components.sort_values(ascending=False)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Performance panels: latency percentiles, throughput, error / timeout rates and
+# cache hit rates, all vectorized over the rollup columns.
+# ────────────────────────────────────────────────────────────────────────────────
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+@_rollup_cached
+def calculate_latency_percentiles(df: pd.DataFrame, by: str = None) -> pd.DataFrame:
+    """
+    Response-time percentiles (p50 / p90 / p99), overall or per group.
+
+    Args:
+        df (pd.DataFrame): Log rollup from load_logs.
+        by (str, optional): Column to group by, e.g. "tool", "domain" or "source".
+                            Requests without a value are grouped under "(none)".
+
+    Returns:
+        pd.DataFrame: One row per group ("all" when ungrouped) with columns
+                      p50, p90, p99 (seconds) and count.
+    """
+    if df.empty or 'response_time' not in df.columns:
+        return pd.DataFrame()
+    latency = df['response_time']
+    if by is None:
+        keys = pd.Series("all", index=df.index)
+    elif by in df.columns:
+        keys = df[by].fillna("(none)")
+    else:
+        return pd.DataFrame()
+    grouped = latency.groupby(keys)
+    table = grouped.quantile(list(PERCENTILES)).unstack()
+    table.columns = [f"p{round(q * 100)}" for q in table.columns]
+    table["count"] = grouped.count()
+    return table.sort_values("count", ascending=False)
+
+
+@_rollup_cached
+def calculate_throughput(df: pd.DataFrame, freq: str = "1h", window: str = None) -> pd.Series:
+    """
+    Requests per time bucket.
+
+    Args:
+        df (pd.DataFrame): Log rollup from load_logs.
+        freq (str): Bucket size (pandas offset alias, e.g. "1h", "15min", "1D").
+        window (str, optional): Only the most recent span of data, e.g. "7D".
+
+    Returns:
+        pd.Series: Request counts indexed by bucket start; empty buckets are 0.
+    """
+    if df.empty:
+        return pd.Series()
+    timestamps = df['timestamp'].dropna()
+    if window:
+        timestamps = timestamps[timestamps >= timestamps.max() - pd.Timedelta(window)]
+    if timestamps.empty:
+        return pd.Series()
+    counts = timestamps.dt.floor(freq).value_counts().sort_index()
+    return counts.asfreq(freq, fill_value=0)
+
+
+@_rollup_cached
+def calculate_error_rates(df: pd.DataFrame) -> dict:
+    """
+    Share of requests that failed ("error") or hit the agent's iteration /
+    time limit ("timeout").
+
+    Returns:
+        dict: requests, errors, timeouts, error_rate, timeout_rate.
+    """
+    if df.empty or 'status' not in df.columns:
+        return {}
+    counts = df['status'].value_counts()
+    total = int(counts.sum())
+    errors, timeouts = int(counts.get("error", 0)), int(counts.get("timeout", 0))
+    return {
+        'requests': total,
+        'errors': errors,
+        'timeouts': timeouts,
+        'error_rate': errors / total if total else 0.0,
+        'timeout_rate': timeouts / total if total else 0.0,
+    }
+
+
+@_rollup_cached
+def calculate_cache_hit_rates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Hits, misses and hit rate per cache (sql_question, sql_result, graph_result)
+    summed over the logged requests.
+    """
+    columns = [column for column in df.columns if column.startswith('cache.')]
+    if df.empty or not columns:
+        return pd.DataFrame()
+    sums = df[columns].sum()
+    caches = sorted({column.split('.')[1] for column in columns})
+    table = pd.DataFrame({
+        'hits': [sums.get(f"cache.{cache}.hits", 0) for cache in caches],
+        'misses': [sums.get(f"cache.{cache}.misses", 0) for cache in caches],
+    }, index=caches).astype("int64")
+    lookups = table['hits'] + table['misses']
+    table['hit_rate'] = (table['hits'] / lookups.where(lookups > 0)).fillna(0.0)
+    return table
@@ -2,38 +2,51 @@
 
 import json
 import os
+import sys
+import logging
 from datetime import datetime
+from typing import Optional
 
-def log_feedback(query: str, answer: str, rating: int, log_file: str = "feedback_log.jsonl"):
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feedback.store import get_feedback_store
+
+def log_feedback(query: str, answer: str, rating: int, log_file: Optional[str] = None):
     """
-    Logs user feedback to a JSONL file.
+    Logs user feedback to the feedback store (feedback/store.py). The write is
+    buffered and flushed in batches by a background thread.
 
     Args:
         query (str): The user's query.
         answer (str): The agent's answer.
         rating (int): The user's rating (e.g., 1 for thumbs up, -1 for thumbs down).
-        log_file (str, optional): The name of the log file. Defaults to "feedback_log.jsonl".
+        log_file (str, optional): Also append the entry to this JSONL file (the old format).
     """
-    feedback_data = {
-        "timestamp": datetime.now().isoformat(),
-        "query": query,
-        "answer": answer,
-        "rating": rating
-    }
-
-    # Ensure the directory exists
-    log_dir = os.path.dirname(log_file)
-    if log_dir and not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-
     try:
-        with open(log_file, "a") as f:
-            f.write(json.dumps(feedback_data) + "\n")
-        print(f"Feedback logged to {log_file}")
+        get_feedback_store().add(query, answer, rating)
     except Exception as e:
-        print(f"Error logging feedback: {e}")
+        logging.error(f"Error logging feedback: {e}")
+
+    if log_file:
+        feedback_data = {
+            "timestamp": datetime.now().isoformat(),
+            "query": query,
+            "answer": answer,
+            "rating": rating
+        }
+        log_dir = os.path.dirname(log_file)
+        if log_dir and not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+        try:
+            with open(log_file, "a") as f:
+                f.write(json.dumps(feedback_data) + "\n")
+        except Exception as e:
+            logging.error(f"Error logging feedback to {log_file}: {e}")
 
 if __name__ == "__main__":
     # Example Usage (for testing)
     log_feedback("What is the capital of France?", "The capital of France is Paris.", 1)
-    log_feedback("What is the meaning of life?", "42", -1)
\ No newline at end of file
+    log_feedback("What is the meaning of life?", "42", -1)
+    print("Ratings:", get_feedback_store().ratings_for_query("what is the capital of france"))
@@ -0,0 +1,296 @@
+# feedback/store.py
+
+import os
+import sys
+import json
+import time
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.retrievers.sql_cache import normalize_question
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Feedback store: clicks are buffered in memory and written in batches by a
+# background thread to an indexed SQLite table, so recording feedback never
+# waits on disk and "how was this query / answer rated" is an index lookup.
+# SQLite rather than DuckDB: many small transactional writes from a long-lived
+# process, with readers in other processes (WAL mode).
+# ────────────────────────────────────────────────────────────────────────────────
+FEEDBACK_DB_PATH = os.getenv("COMPASS_FEEDBACK_DB", os.path.join(project_root, "feedback", "feedback.db"))
+# The old logger wrote feedback_log.jsonl relative to the working directory, so
+# history exists both at the project root and under ui/ (app run from there).
+LEGACY_JSONL_PATHS = [
+    os.path.join(project_root, "feedback_log.jsonl"),
+    os.path.join(project_root, "ui", "feedback_log.jsonl"),
+]
+FLUSH_BATCH_SIZE = int(os.getenv("COMPASS_FEEDBACK_BATCH_SIZE", "50"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("COMPASS_FEEDBACK_FLUSH_SECONDS", "2"))
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        query TEXT NOT NULL,
+        query_hash TEXT NOT NULL,
+        answer TEXT,
+        answer_hash TEXT,
+        rating INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS feedback_timestamp ON feedback (timestamp)",
+    "CREATE INDEX IF NOT EXISTS feedback_query_rating ON feedback (query_hash, rating)",
+    "CREATE INDEX IF NOT EXISTS feedback_query_answer ON feedback (query_hash, answer_hash)",
+    "CREATE INDEX IF NOT EXISTS feedback_rating ON feedback (rating, timestamp)",
+    """
+    CREATE TABLE IF NOT EXISTS feedback_imports (
+        path TEXT PRIMARY KEY,
+        rows INTEGER NOT NULL,
+        imported_at TEXT NOT NULL
+    )
+    """,
+]
+_INSERT = ("INSERT INTO feedback (timestamp, query, query_hash, answer, answer_hash, rating) "
+           "VALUES (?, ?, ?, ?, ?, ?)")
+
+
+def query_hash(query: str) -> str:
+    """
+    Hash of the normalized query (same normalization as the SQL question cache).
+    """
+    return hashlib.sha1(normalize_question(query).encode("utf-8")).hexdigest()
+
+
+def answer_hash(answer: Optional[str]) -> Optional[str]:
+    if answer is None:
+        return None
+    return hashlib.sha1(" ".join(answer.split()).encode("utf-8")).hexdigest()
+
+
+def _row(query: str, answer: Optional[str], rating: int, timestamp: Optional[str] = None) -> tuple:
+    return (timestamp or datetime.now().isoformat(), query, query_hash(query), answer, answer_hash(answer), int(rating))
+
+
+def _summary(up: Optional[int], down: Optional[int], last: Optional[str]) -> Dict[str, Any]:
+    up, down = up or 0, down or 0
+    count = up + down
+    return {
+        "count": count,
+        "up": up,
+        "down": down,
+        "score": (up - down) / count if count else 0.0,
+        "last_rated": last,
+    }
+
+
+class FeedbackStore:
+    """
+    Buffered, indexed feedback storage.
+
+    `add` only appends to an in-memory buffer; a writer thread flushes it in one
+    transaction every `flush_interval` seconds or as soon as `batch_size`
+    entries are pending. Read methods flush first, so they see every click
+    recorded by this process.
+    """
+
+    def __init__(self, db_path: str = FEEDBACK_DB_PATH, batch_size: int = FLUSH_BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._local = threading.local()
+        self.flushes = 0
+        self.written = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Used only under _write_lock (flushes, imports)
+        self._write_con = self._connect()
+        with self._write_con as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                con.execute(statement)
+        self._writer = threading.Thread(target=self._run, name="compass-feedback-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def _reader(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = self._connect()
+        return con
+
+    # ── Writes ──
+    def add(self, query: str, answer: Optional[str], rating: int, timestamp: Optional[str] = None):
+        """
+        Records one rating (non-blocking).
+        """
+        with self._lock:
+            self._pending.append(_row(query, answer, rating, timestamp))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """
+        Writes all buffered entries in one transaction.
+
+        Returns:
+            int: Number of entries written.
+        """
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with self._write_con as con:
+                    con.executemany(_INSERT, batch)
+            except sqlite3.Error as e:
+                logging.error(f"Feedback flush failed ({len(batch)} entries kept for retry): {e}")
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+            self.flushes += 1
+            self.written += len(batch)
+            return len(batch)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+    def import_jsonl(self, path: str) -> int:
+        """
+        One-time import of a feedback JSONL file written by the old logger.
+        A file already imported (by absolute path) is skipped.
+
+        Returns:
+            int: Number of rows imported (0 if skipped or missing).
+        """
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            return 0
+        with self._write_lock, self._write_con as con:
+            if con.execute("SELECT 1 FROM feedback_imports WHERE path = ?", (path,)).fetchone():
+                return 0
+            rows = []
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        rows.append(_row(entry["query"], entry.get("answer"), entry["rating"], entry.get("timestamp")))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+            con.executemany(_INSERT, rows)
+            con.execute("INSERT INTO feedback_imports (path, rows, imported_at) VALUES (?, ?, ?)",
+                        (path, len(rows), datetime.now().isoformat()))
+        logging.info(f"Imported {len(rows)} feedback entries from {path}")
+        return len(rows)
+
+    # ── Reads ──
+    def ratings_for_query(self, query: str) -> Dict[str, Any]:
+        """
+        Rating summary for a query (matched after normalization): count, up,
+        down, score in [-1, 1] and the time of the last rating.
+        """
+        self.flush()
+        row = self._reader().execute(
+            "SELECT SUM(rating > 0), SUM(rating < 0), MAX(timestamp) FROM feedback WHERE query_hash = ?",
+            (query_hash(query),),
+        ).fetchone()
+        return _summary(*row)
+
+    def ratings_for_answer(self, query: str, answer: str) -> Dict[str, Any]:
+        """
+        Rating summary for one answer to a query.
+        """
+        self.flush()
+        row = self._reader().execute(
+            "SELECT SUM(rating > 0), SUM(rating < 0), MAX(timestamp) FROM feedback "
+            "WHERE query_hash = ? AND answer_hash = ?",
+            (query_hash(query), answer_hash(answer)),
+        ).fetchone()
+        return _summary(*row)
+
+    def recent(self, limit: int = 20, rating: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Latest feedback entries, optionally only positive (1) or negative (-1) ones.
+        """
+        self.flush()
+        sql = "SELECT timestamp, query, answer, rating FROM feedback"
+        params: tuple = ()
+        if rating is not None:
+            sql += " WHERE rating " + (">" if rating > 0 else "<") + " 0"
+        sql += " ORDER BY timestamp DESC LIMIT ?"
+        params += (limit,)
+        columns = ("timestamp", "query", "answer", "rating")
+        return [dict(zip(columns, row)) for row in self._reader().execute(sql, params)]
+
+    def daily_counts(self, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Up / down counts per day (ISO date), optionally from `since` on.
+        """
+        self.flush()
+        rows = self._reader().execute(
+            "SELECT substr(timestamp, 1, 10) AS day, SUM(rating > 0), SUM(rating < 0) FROM feedback "
+            "WHERE timestamp >= ? GROUP BY day ORDER BY day",
+            (since or "",),
+        )
+        return [{"day": day, "up": up, "down": down} for day, up, down in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {"db_path": self.db_path, "pending": pending, "flushes": self.flushes, "written": self.written}
+
+
+@lru_cache(maxsize=None)
+def get_feedback_store(db_path: str = FEEDBACK_DB_PATH) -> FeedbackStore:
+    """
+    Returns the process-wide feedback store, importing the legacy
+    feedback_log.jsonl files on first use. Buffered entries are flushed at exit.
+    """
+    store = FeedbackStore(db_path)
+    for path in LEGACY_JSONL_PATHS:
+        try:
+            store.import_jsonl(path)
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Could not import {path}: {e}")
+    atexit.register(store.close)
+    return store
+
+
+if __name__ == "__main__":
+    store = get_feedback_store()
+    store.add("What is USA?", "USA is an abbreviation for the United States of America.", 1)
+    started = time.perf_counter()
+    print("Ratings for 'What is USA?':", store.ratings_for_query("what is usa"))
+    print(f"Lookup took {(time.perf_counter() - started) * 1000:.2f} ms")
+    print("Recent negative feedback:", [entry["query"] for entry in store.recent(5, rating=-1)])
+    print("Store:", store.stats())
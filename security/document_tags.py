@@ -0,0 +1,116 @@
+# security/document_tags.py
+
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from security.pii_filter import PIISpan, find_pii_spans, redact_pii
+from security.compliance_tagger import find_compliance_terms
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Ingest-time tags. Documents are scanned for PII and compliance terms once,
+# when they are parsed / embedded; the tags are stored with the document (in
+# parsed.jsonl and the Qdrant payload) so retrieval can filter or pre-redact
+# and the UI can redact passages without scanning them again.
+#
+# Tag format (JSON-friendly):
+#   {"pii_spans": [{"type": "EMAIL", "start": 10, "end": 26}, ...],
+#    "pii_types": ["EMAIL"], "has_pii": true,
+#    "compliance_terms": ["restatement"],
+#    "compliance_matches": [{"term": "restatement", "category": "financial_reporting",
+#                            "start": 40, "end": 51}]}
+# Span offsets index into the text the tags were computed for; the PII values
+# themselves are not copied into the tags.
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def tag_text(text: Optional[str]) -> Dict[str, Any]:
+    """
+    Scans a text once for PII and compliance terms.
+
+    Args:
+        text (str): The text to tag. None is treated as empty.
+
+    Returns:
+        dict: Tags in the format described above.
+    """
+    spans = find_pii_spans(text) if text else []
+    matches = find_compliance_terms(text) if text else []
+    return {
+        "pii_spans": [{"type": span.type, "start": span.start, "end": span.end} for span in spans],
+        "pii_types": sorted({span.type for span in spans}),
+        "has_pii": bool(spans),
+        "compliance_terms": list(dict.fromkeys(match.term for match in matches)),
+        "compliance_matches": [match._asdict() for match in matches],
+    }
+
+
+def combine_tags(parts: Iterable[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Combines the tags of several fields into tags for a text built from them,
+    e.g. an email's subject and body joined into the embedded text.
+
+    Args:
+        parts (iterable): (offset, tags) pairs, where offset is where the
+                          field starts in the combined text.
+
+    Returns:
+        dict: Tags for the combined text.
+    """
+    spans: List[Dict[str, Any]] = []
+    matches: List[Dict[str, Any]] = []
+    for offset, tags in parts:
+        spans.extend(
+            {**span, "start": span["start"] + offset, "end": span["end"] + offset}
+            for span in tags.get("pii_spans", [])
+        )
+        matches.extend(
+            {**match, "start": match["start"] + offset, "end": match["end"] + offset}
+            for match in tags.get("compliance_matches", [])
+        )
+    spans.sort(key=lambda span: span["start"])
+    matches.sort(key=lambda match: (match["start"], -match["end"]))
+    return {
+        "pii_spans": spans,
+        "pii_types": sorted({span["type"] for span in spans}),
+        "has_pii": bool(spans),
+        "compliance_terms": list(dict.fromkeys(match["term"] for match in matches)),
+        "compliance_matches": matches,
+    }
+
+
+def pii_spans_from_tags(text: str, tags: Optional[Dict[str, Any]]) -> Optional[List[PIISpan]]:
+    """
+    Rebuilds PIISpan tuples for `text` from stored tags.
+
+    Returns:
+        list or None: The spans, or None when there are no stored tags
+                      (callers then fall back to scanning).
+    """
+    if not tags or "pii_spans" not in tags:
+        return None
+    return [
+        PIISpan(span["type"], span["start"], span["end"], text[span["start"]:span["end"]])
+        for span in tags["pii_spans"]
+    ]
+
+
+def redact_tagged(text: str, tags: Optional[Dict[str, Any]]) -> str:
+    """
+    Redacts PII from a text using its stored tags, scanning only if it has none.
+    """
+    return redact_pii(text, spans=pii_spans_from_tags(text, tags))
+
+
+if __name__ == "__main__":
+    subject = "Earnings restatement"
+    body = "Contact jane.doe@example.com or 555-123-4567 before the restatement is filed."
+    text = f"Subject: {subject}\n\n{body}"
+    tags = combine_tags([(len("Subject: "), tag_text(subject)), (len(f"Subject: {subject}\n\n"), tag_text(body))])
+    print("Tags:", tags)
+    print("Same as scanning the combined text:", tags == tag_text(text))
+    print("Redacted:", redact_tagged(text, tags))
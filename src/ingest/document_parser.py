@@ -1,10 +1,17 @@
 # src/ingest/document_parser.py
 
 import os
+import sys
 import fitz # PyMuPDF
 import email # Python's built-in email package
 import json
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from security.document_tags import tag_text
+
 def parse_pdf(file_path):
     """
     Extracts text from a PDF file using PyMuPDF.
@@ -52,6 +59,18 @@ def parse_eml(file_path):
         print(f"Error parsing EML {file_path}: {e}")
         return None
 
+def tag_document(doc):
+    """
+    Scans each text field of a parsed document once for PII and compliance
+    terms and stores the results under doc["tags"][<field>].
+    Returns the document.
+    """
+    doc["tags"] = {
+        field: tag_text(doc.get(field))
+        for field in ("subject", "body", "content") if field in doc
+    }
+    return doc
+
 def main():
     script_dir = os.path.dirname(__file__)
     project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
@@ -72,23 +91,23 @@ def main():
                 print(f"Parsing PDF: {filename}")
                 content = parse_pdf(file_path)
                 if content:
-                    parsed_documents.append({
+                    parsed_documents.append(tag_document({
                         "id": doc_id,
                         "filename": filename,
                         "type": "pdf",
                         "content": content
-                    })
+                    }))
             elif filename.lower().endswith('.eml'):
                 print(f"Parsing EML: {filename}")
                 email_data = parse_eml(file_path)
                 if email_data:
-                    parsed_documents.append({
+                    parsed_documents.append(tag_document({
                         "id": doc_id,
                         "filename": filename,
                         "type": "email",
                         "subject": email_data.get("subject"),
                         "body": email_data.get("body")
-                    })
+                    }))
             else:
                 print(f"Skipping unsupported file type: {filename}")
 
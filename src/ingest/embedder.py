@@ -1,10 +1,51 @@
 # src/ingest/embedder.py
 
 import os
+import sys
 import json
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient, models
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from security.document_tags import combine_tags, tag_text
+
+# Payload fields written from the ingest-time tags (see security/document_tags.py),
+# indexed so retrieval can filter on them.
+TAG_PAYLOAD_INDEXES = {
+    "has_pii": models.PayloadSchemaType.BOOL,
+    "pii_types": models.PayloadSchemaType.KEYWORD,
+    "compliance_terms": models.PayloadSchemaType.KEYWORD,
+}
+
+def text_and_tags(doc):
+    """
+    Builds the text to embed for a parsed document and its tags.
+
+    The tags stored by document_parser.py are per field; they are shifted to
+    the field's position in the embedded text instead of scanning it again.
+    Documents parsed before tagging existed are scanned here.
+    Returns (text_content, tags).
+    """
+    stored = doc.get("tags") or {}
+    if doc.get("type") == "email":
+        prefix = "Subject: "
+        subject = f"{doc.get('subject', '')}"
+        body = f"{doc.get('body', '')}"
+        text_content = f"{prefix}{subject}\n\n{body}"
+        if "subject" in stored and "body" in stored:
+            return text_content, combine_tags([
+                (len(prefix), stored["subject"]),
+                (len(prefix) + len(subject) + 2, stored["body"]),
+            ])
+    else: # Assume PDF or other types with 'content'
+        text_content = doc.get("content", "")
+        if "content" in stored:
+            return text_content, stored["content"]
+    return text_content, tag_text(text_content)
+
 def main():
     script_dir = os.path.dirname(__file__)
     project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
@@ -54,6 +95,8 @@ def main():
             print(f"Collection '{collection_name}' created.")
         else:
             print(f"Collection '{collection_name}' already exists. Will add new points.")
+        for field_name, field_schema in TAG_PAYLOAD_INDEXES.items():
+            client.create_payload_index(collection_name=collection_name, field_name=field_name, field_schema=field_schema)
     except Exception as e:
         print(f"Error creating/checking Qdrant collection: {e}")
         return
@@ -69,10 +112,7 @@ def main():
             for line in f:
                 doc = json.loads(line)
                 # Combine subject and body for emails, use content for PDFs
-                if doc.get("type") == "email":
-                    text_content = f"Subject: {doc.get('subject', '')}\n\n{doc.get('body', '')}"
-                else: # Assume PDF or other types with 'content'
-                    text_content = doc.get("content", "")
+                text_content, tags = text_and_tags(doc)
 
                 if text_content: # Only embed if there's actual text
                     # Store all original doc info + the combined text_content for embedding
@@ -81,11 +121,12 @@ def main():
                         "id": doc["id"],
                         "filename": doc["filename"],
                         "type": doc["type"],
-                        "text_content": text_content # This is the text that will be embedded and stored in payload
+                        "text_content": text_content, # This is the text that will be embedded and stored in payload
+                        **tags, # pii_spans / pii_types / has_pii / compliance_terms, offsets into text_content
                     }
                     # Add other original fields from 'doc' if they are not already covered
                     for key, value in doc.items():
-                        if key not in doc_for_embedding:
+                        if key not in doc_for_embedding and key != "tags":
                             doc_for_embedding[key] = value
 
                     documents_to_embed.append(doc_for_embedding)
@@ -0,0 +1,255 @@
+# src/ingest/graph_loader.py
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.retrievers.graph_retriever import GRAPH_VERSION_LABEL, bump_graph_version
+from src.retrievers.graph_snapshot import DEFAULT_SNAPSHOT_PATH, GraphSnapshot
+
+load_dotenv()
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Input layout (under data/graph by default), CSV or JSONL:
+#   nodes/<Label>.csv|jsonl  one node per row; the key column identifies it,
+#                            every other non-empty column becomes a property
+#   edges/<TYPE>.csv|jsonl   one relationship per row: source, target (key
+#                            values), optional source_label / target_label,
+#                            other columns become relationship properties
+# ────────────────────────────────────────────────────────────────────────────────
+BATCH_SIZE = int(os.getenv("COMPASS_GRAPH_BATCH_SIZE", "5000"))
+LOAD_WORKERS = int(os.getenv("COMPASS_GRAPH_LOAD_WORKERS", "4"))
+
+# Key property per label (default: "id" if the file has it, otherwise "name").
+NODE_KEYS = {
+    "Person": "name",
+    "Project": "name",
+    "Department": "name",
+}
+# Extra (non-unique) property indexes created before loading.
+NODE_INDEXES = {
+    "Person": ["role"],
+}
+# Endpoint labels for relationship files without source_label / target_label columns.
+EDGE_ENDPOINTS = {
+    "MANAGES": ("Person", "Person"),
+    "WORKS_ON": ("Person", "Project"),
+    "BELONGS_TO": ("Person", "Department"),
+}
+
+_EDGE_COLUMNS = {"source", "target", "source_label", "target_label"}
+
+
+def _quote(identifier: str) -> str:
+    return "`" + identifier.replace("`", "``") + "`"
+
+
+def _input_files(directory: str) -> Dict[str, List[str]]:
+    """
+    Maps each label / relationship type to its input files (<name>.csv, <name>.jsonl).
+    """
+    files: Dict[str, List[str]] = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv")) + glob.glob(os.path.join(directory, "*.jsonl"))):
+        files.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(path)
+    return files
+
+
+def _read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    # Streamed row by row; empty CSV cells are treated as missing properties.
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield {k: v for k, v in json.loads(line).items() if v is not None}
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                yield {k: v for k, v in row.items() if k and v not in (None, "")}
+
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _node_key(label: str, paths: List[str]) -> str:
+    if label in NODE_KEYS:
+        return NODE_KEYS[label]
+    first = next(_read_rows(paths[0]), {})
+    return "id" if "id" in first else "name"
+
+
+def create_schema(driver, database: Optional[str], node_keys: Dict[str, str]):
+    """
+    Creates a uniqueness constraint (and so an index) on each label's key, plus
+    the configured secondary indexes, before any data is written.
+    """
+    with driver.session(database=database) as session:
+        for label, key in node_keys.items():
+            session.run(
+                f"CREATE CONSTRAINT {_quote(f'{label}_{key}_unique')} IF NOT EXISTS "
+                f"FOR (n:{_quote(label)}) REQUIRE n.{_quote(key)} IS UNIQUE"
+            ).consume()
+            for prop in NODE_INDEXES.get(label, []):
+                session.run(
+                    f"CREATE INDEX {_quote(f'{label}_{prop}')} IF NOT EXISTS FOR (n:{_quote(label)}) ON (n.{_quote(prop)})"
+                ).consume()
+        session.run(
+            f"CREATE CONSTRAINT {_quote(f'{GRAPH_VERSION_LABEL}_id_unique')} IF NOT EXISTS "
+            f"FOR (n:{_quote(GRAPH_VERSION_LABEL)}) REQUIRE n.id IS UNIQUE"
+        ).consume()
+
+
+def load_nodes(driver, database: Optional[str], label: str, key: str, paths: List[str],
+               batch_size: int = BATCH_SIZE) -> int:
+    """
+    MERGEs the nodes of one label in batches of `batch_size` (one write transaction each).
+
+    Returns:
+        int: Number of rows written.
+    """
+    query = (
+        f"UNWIND $rows AS row "
+        f"MERGE (n:{_quote(label)} {{{_quote(key)}: row.key}}) "
+        f"SET n += row.props"
+    )
+    written = 0
+    with driver.session(database=database) as session:
+        for path in paths:
+            rows = (
+                {"key": row.pop(key), "props": row}
+                for row in _read_rows(path) if key in row
+            )
+            for batch in _batches(rows, batch_size):
+                session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+                written += len(batch)
+    return written
+
+
+def load_edges(driver, database: Optional[str], rel_type: str, paths: List[str], node_keys: Dict[str, str],
+               batch_size: int = BATCH_SIZE) -> int:
+    """
+    MERGEs the relationships of one type in batches, grouped by endpoint labels
+    so each statement can use the key constraints to find both endpoints.
+
+    Returns:
+        int: Number of rows written.
+    """
+    default_source, default_target = EDGE_ENDPOINTS.get(rel_type, (None, None))
+    written = 0
+    with driver.session(database=database) as session:
+        for path in paths:
+            groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+            for row in _read_rows(path):
+                endpoints = (row.get("source_label", default_source), row.get("target_label", default_target))
+                if None in endpoints or "source" not in row or "target" not in row:
+                    print(f"Skipping relationship without endpoints/labels in {path}: {row}")
+                    continue
+                props = {k: v for k, v in row.items() if k not in _EDGE_COLUMNS}
+                batch = groups.setdefault(endpoints, [])
+                batch.append({"source": row["source"], "target": row["target"], "props": props})
+                if len(batch) >= batch_size:
+                    written += _write_edges(session, rel_type, endpoints, node_keys, groups.pop(endpoints))
+            for endpoints, batch in groups.items():
+                written += _write_edges(session, rel_type, endpoints, node_keys, batch)
+    return written
+
+
+def _write_edges(session, rel_type: str, endpoints: Tuple[str, str], node_keys: Dict[str, str],
+                 batch: List[Dict[str, Any]]) -> int:
+    source_label, target_label = endpoints
+    source_key = node_keys.get(source_label, NODE_KEYS.get(source_label, "name"))
+    target_key = node_keys.get(target_label, NODE_KEYS.get(target_label, "name"))
+    query = (
+        f"UNWIND $rows AS row "
+        f"MATCH (a:{_quote(source_label)} {{{_quote(source_key)}: row.source}}) "
+        f"MATCH (b:{_quote(target_label)} {{{_quote(target_key)}: row.target}}) "
+        f"MERGE (a)-[r:{_quote(rel_type)}]->(b) "
+        f"SET r += row.props"
+    )
+    session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+    return len(batch)
+
+
+def main(data_path: Optional[str] = None, batch_size: int = BATCH_SIZE, workers: int = LOAD_WORKERS,
+         snapshot: bool = False):
+    data_path = data_path or os.path.join(project_root, 'data', 'graph')
+    node_files = _input_files(os.path.join(data_path, 'nodes'))
+    edge_files = _input_files(os.path.join(data_path, 'edges'))
+    if not node_files and not edge_files:
+        print(f"No node or edge files found under {data_path}/nodes or {data_path}/edges.")
+        return
+
+    uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+    database = os.getenv("NEO4J_DATABASE") or None
+    print(f"Loading graph data from {data_path} into Neo4j at {uri} (batch size {batch_size}, {workers} workers)")
+    driver = GraphDatabase.driver(
+        uri,
+        auth=(os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "your_neo4j_password")),
+        max_connection_pool_size=max(workers, 1) + 2,
+    )
+    try:
+        driver.verify_connectivity()
+        started = time.perf_counter()
+
+        # --- Constraints / indexes first, so every MERGE below is an index lookup ---
+        node_keys = {label: _node_key(label, paths) for label, paths in node_files.items()}
+        node_keys.update({label: key for label, key in NODE_KEYS.items() if label not in node_keys})
+        create_schema(driver, database, node_keys)
+        print(f"Constraints ready for labels: {', '.join(sorted(node_keys))}")
+
+        # --- Nodes: one worker per label (labels never contend for the same locks) ---
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = {
+                label: pool.submit(load_nodes, driver, database, label, node_keys[label], paths, batch_size)
+                for label, paths in node_files.items()
+            }
+            for label, future in futures.items():
+                print(f"Merged {future.result()} '{label}' nodes.")
+
+        # --- Relationships: one type at a time; types share endpoint nodes, and
+        # concurrent MERGEs on the same nodes would deadlock and retry ---
+        for rel_type, paths in edge_files.items():
+            rel_started = time.perf_counter()
+            count = load_edges(driver, database, rel_type, paths, node_keys, batch_size)
+            print(f"Merged {count} '{rel_type}' relationships in {time.perf_counter() - rel_started:.2f}s.")
+
+        version = bump_graph_version(driver, database)
+        print(f"Graph load finished in {time.perf_counter() - started:.2f}s; graph version is now {version}.")
+
+        if snapshot:
+            graph = GraphSnapshot.from_neo4j(driver, database, exclude_labels=[GRAPH_VERSION_LABEL])
+            graph.version = version
+            graph.save(DEFAULT_SNAPSHOT_PATH)
+            print(f"Graph snapshot saved to {DEFAULT_SNAPSHOT_PATH}: {graph.stats()}")
+    except Exception as e:
+        print(f"Error loading graph data: {e}")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load node and edge files into Neo4j.")
+    parser.add_argument("--data-path", help="Directory with nodes/ and edges/ (default: data/graph)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per UNWIND batch")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS, help="Parallel node loaders (one per label)")
+    parser.add_argument("--snapshot", action="store_true", help="Export the in-process graph snapshot afterwards")
+    args = parser.parse_args()
+    main(args.data_path, args.batch_size, args.workers, args.snapshot)
@@ -0,0 +1,192 @@
+# src/ingest/schema_digest.py
+
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+# Columns with at most this many distinct values list their most frequent values;
+# other columns list a few examples.
+LOW_CARDINALITY = 20
+SAMPLE_VALUES = 3
+MAX_VALUE_LENGTH = 40
+
+# Table written by structured_loader describing its materialized aggregates.
+AGGREGATES_METADATA_TABLE = "compass_aggregates"
+
+
+def default_digest_path(db_path: str) -> str:
+    return os.path.join(os.path.dirname(db_path), 'schema_digest.json')
+
+
+def db_fingerprint(db_path: str) -> str:
+    """
+    Identifies one version of the database file (size + modification time).
+    """
+    stat = os.stat(db_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def _short(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + "..."
+    if isinstance(value, (int, float, str, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def build_schema_digest(con: duckdb.DuckDBPyConnection) -> Dict[str, Any]:
+    """
+    Introspects every table once: columns, types, row counts, approximate
+    distinct counts, representative values and key relationships. Materialized
+    aggregates registered by structured_loader are listed with their descriptions.
+
+    The caller stamps the result with `db_fingerprint` once the file is closed
+    (closing a read-write connection checkpoints and changes the file).
+
+    Args:
+        con (duckdb.DuckDBPyConnection): An open connection to the database.
+
+    Returns:
+        dict: The schema digest.
+    """
+    tables: Dict[str, Any] = {}
+    table_names = [row[0] for row in con.execute(
+        "SELECT table_name FROM information_schema.tables "
+        "WHERE table_schema = 'main' AND table_type = 'BASE TABLE' ORDER BY table_name"
+    ).fetchall()]
+
+    aggregates: Dict[str, str] = {}
+    if AGGREGATES_METADATA_TABLE in table_names:
+        table_names.remove(AGGREGATES_METADATA_TABLE)
+        aggregates = {
+            name: description
+            for name, description in con.execute(
+                f'SELECT name, description FROM "{AGGREGATES_METADATA_TABLE}" ORDER BY name'
+            ).fetchall()
+            if name in table_names
+        }
+
+    for table in table_names:
+        columns = con.execute(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = 'main' AND table_name = ? ORDER BY ordinal_position",
+            [table],
+        ).fetchall()
+        row_count = con.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+        distinct_counts = con.execute(
+            "SELECT " + ", ".join(f'approx_count_distinct("{name}")' for name, _ in columns) + f' FROM "{table}"'
+        ).fetchone() if columns else ()
+
+        column_info: List[Dict[str, Any]] = []
+        for (name, data_type), distinct in zip(columns, distinct_counts):
+            if distinct <= LOW_CARDINALITY:
+                values = con.execute(
+                    f'SELECT "{name}" FROM "{table}" WHERE "{name}" IS NOT NULL '
+                    f'GROUP BY 1 ORDER BY count(*) DESC, 1 LIMIT {SAMPLE_VALUES + 2}'
+                ).fetchall()
+            else:
+                values = con.execute(
+                    f'SELECT DISTINCT "{name}" FROM "{table}" WHERE "{name}" IS NOT NULL LIMIT {SAMPLE_VALUES}'
+                ).fetchall()
+            column_info.append({
+                "name": name,
+                "type": data_type,
+                "distinct": int(min(distinct, row_count)),
+                "values": [_short(v[0]) for v in values],
+            })
+
+        tables[table] = {"row_count": int(row_count), "columns": column_info}
+
+    return {"tables": tables, "aggregates": aggregates, "relationships": _infer_relationships(con, tables)}
+
+
+def _singular(name: str) -> str:
+    # Removes one plural suffix: categories -> category, addresses -> address,
+    # statuses -> status, orders -> order.
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith(("sses", "uses", "xes", "ches", "shes")):
+        return name[:-2]
+    if name.endswith("s") and not name.endswith("ss"):
+        return name[:-1]
+    return name
+
+
+def _infer_relationships(con: duckdb.DuckDBPyConnection, tables: Dict[str, Any]) -> List[Dict[str, str]]:
+    relationships: List[Dict[str, str]] = []
+    try:
+        for table, constraint_text in con.execute(
+            "SELECT table_name, constraint_text FROM duckdb_constraints() WHERE constraint_type = 'FOREIGN KEY'"
+        ).fetchall():
+            relationships.append({"from": table, "constraint": constraint_text})
+    except duckdb.Error:
+        pass
+
+    # Naming convention: <entity>_id in any table refers to the table named
+    # <entity>s (or <entity> itself, for singular table names).
+    owners = {f"{_singular(name)}_id": name for name in tables}
+    owners.update({f"{name}_id": name for name in tables})
+    for table, info in tables.items():
+        for column in info["columns"]:
+            owner = owners.get(column["name"])
+            if owner and owner != table:
+                relationships.append({"from": f"{table}.{column['name']}", "to": f"{owner}.{column['name']}"})
+    return relationships
+
+
+def save_schema_digest(digest: Dict[str, Any], db_path: str, digest_path: Optional[str] = None):
+    """
+    Stamps the digest with the current database fingerprint and writes it as JSON.
+    """
+    digest = dict(digest, fingerprint=db_fingerprint(db_path))
+    with open(digest_path or default_digest_path(db_path), 'w', encoding='utf-8') as f:
+        json.dump(digest, f, ensure_ascii=False, indent=1, default=str)
+    return digest
+
+
+def load_schema_digest(db_path: str, digest_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Loads the persisted digest if it still matches the database file.
+
+    Returns:
+        dict: The digest, or None if it is missing or stale.
+    """
+    digest_path = digest_path or default_digest_path(db_path)
+    try:
+        with open(digest_path, 'r', encoding='utf-8') as f:
+            digest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if digest.get("fingerprint") != db_fingerprint(db_path):
+        logging.info(f"Schema digest at {digest_path} is stale; it will be rebuilt.")
+        return None
+    return digest
+
+
+def render_schema_digest(digest: Dict[str, Any], table_names: Optional[List[str]] = None) -> str:
+    """
+    Renders the digest as compact text for an LLM prompt.
+    """
+    lines: List[str] = []
+    aggregates = digest.get("aggregates", {})
+    for table, info in digest["tables"].items():
+        if table_names and table not in table_names:
+            continue
+        if table in aggregates:
+            lines.append(f"Table {table} ({info['row_count']} rows) -- precomputed summary: {aggregates[table]}")
+        else:
+            lines.append(f"Table {table} ({info['row_count']} rows)")
+        for column in info["columns"]:
+            values = ", ".join(repr(v) if isinstance(v, str) else str(v) for v in column["values"])
+            lines.append(f"  {column['name']} {column['type']} [{column['distinct']} distinct] e.g. {values}")
+    relationships = digest.get("relationships", [])
+    if relationships:
+        lines.append("Relationships:")
+        lines.extend(
+            f"  {r['from']} -> {r['to']}" if "to" in r else f"  {r['from']}: {r['constraint']}"
+            for r in relationships
+        )
+    return "\n".join(lines)
@@ -1,111 +1,349 @@
 # src/ingest/structured_loader.py
 
 import duckdb
-import pandas as pd
 import os # Import os module to handle file paths
+import sys
+import glob
+import time
+import argparse
 
-def main():
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.ingest.schema_digest import build_schema_digest, save_schema_digest
+from src.retrievers.duckdb_pool import swap_in_database
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Table specs: source file(s) (CSV or Parquet, globs allowed, relative to
+# data/structured), explicit column types, primary key (one column or a list)
+# and secondary indexes. Optional tables are skipped when their source is absent.
+# ────────────────────────────────────────────────────────────────────────────────
+TABLE_SPECS = {
+    "customers": {
+        "source": "customers.csv",
+        "columns": {
+            "customer_id": "INTEGER",
+            "first_name": "VARCHAR",
+            "last_name": "VARCHAR",
+            "phone": "VARCHAR",
+            "email": "VARCHAR",
+            "street": "VARCHAR",
+            "city": "VARCHAR",
+            "state": "VARCHAR",
+            "zip_code": "VARCHAR",
+        },
+        "primary_key": "customer_id",
+        "indexes": [],
+    },
+    "orders": {
+        "source": "orders.csv",
+        "columns": {
+            "order_id": "INTEGER",
+            "customer_id": "INTEGER",
+            "order_status": "INTEGER",
+            "order_date": "DATE",
+            "required_date": "DATE",
+            "shipped_date": "DATE",
+            "store_id": "INTEGER",
+            "staff_id": "INTEGER",
+        },
+        "primary_key": "order_id",
+        "indexes": ["customer_id"],
+    },
+    "products": {
+        "source": "products.csv",
+        "columns": {
+            "product_id": "INTEGER",
+            "product_name": "VARCHAR",
+            "brand_id": "INTEGER",
+            "category_id": "INTEGER",
+            "model_year": "INTEGER",
+            "list_price": "DECIMAL(10, 2)",
+        },
+        "primary_key": "product_id",
+        "indexes": [],
+    },
+    "order_items": {
+        "source": "order_items.csv",
+        "columns": {
+            "order_id": "INTEGER",
+            "item_id": "INTEGER",
+            "product_id": "INTEGER",
+            "quantity": "INTEGER",
+            "list_price": "DECIMAL(10, 2)",
+            "discount": "DECIMAL(4, 2)",
+        },
+        "primary_key": ["order_id", "item_id"],
+        "indexes": ["product_id"],
+        "optional": True,
+    },
+}
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Materialized summary tables. Each is an aggregate over one base table
+# (`{source}` in the query), refreshed after that table loads: fully on
+# "replace", and only for the affected `group_by` keys on "append"/"merge".
+# ────────────────────────────────────────────────────────────────────────────────
+AGGREGATE_SPECS = {
+    "orders_per_customer_year": {
+        "description": "Number of orders per customer per calendar year of order_date. "
+                       "Use for top customers by orders and orders-per-customer averages.",
+        "source_table": "orders",
+        "group_by": ["customer_id", "order_year"],
+        "query": "SELECT customer_id, CAST(year(order_date) AS INTEGER) AS order_year, count(*) AS order_count "
+                 "FROM {source} GROUP BY 1, 2",
+    },
+    "order_counts_by_status_store": {
+        "description": "Number of orders per order_status and store_id.",
+        "source_table": "orders",
+        "group_by": ["order_status", "store_id"],
+        "query": "SELECT order_status, store_id, count(*) AS order_count FROM {source} GROUP BY 1, 2",
+    },
+    "revenue_by_product": {
+        "description": "Units sold and revenue (quantity * list_price * (1 - discount)) per product_id.",
+        "source_table": "order_items",
+        "group_by": ["product_id"],
+        "query": "SELECT product_id, sum(quantity) AS units_sold, "
+                 "sum(quantity * list_price * (1 - discount)) AS revenue FROM {source} GROUP BY 1",
+    },
+}
+
+# Metadata table describing the materialized aggregates (read by the schema digest).
+AGGREGATES_METADATA_TABLE = "compass_aggregates"
+
+# Strings treated as SQL NULL in CSV extracts.
+NULL_STRINGS = ["NULL", ""]
+
+LOAD_MODES = ("replace", "append", "merge")
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def source_relation(spec: dict, data_path: str) -> str:
+    """
+    Returns a DuckDB table function reading the spec's source file(s) natively
+    (parallel CSV/Parquet readers) with the declared column types.
+    """
+    pattern = os.path.join(data_path, spec["source"])
+    if pattern.lower().endswith(".parquet"):
+        casts = ", ".join(f'CAST("{name}" AS {dtype}) AS "{name}"' for name, dtype in spec["columns"].items())
+        return f"(SELECT {casts} FROM read_parquet({_sql_string(pattern)}))"
+    columns = ", ".join(f"{_sql_string(name)}: {_sql_string(dtype)}" for name, dtype in spec["columns"].items())
+    null_strings = ", ".join(_sql_string(s) for s in NULL_STRINGS)
+    return (
+        f"read_csv({_sql_string(pattern)}, header = true, auto_detect = false, "
+        f"nullstr = [{null_strings}], columns = {{{columns}}})"
+    )
+
+
+def _key_columns(spec: dict) -> list:
+    key = spec.get("primary_key") or []
+    return [key] if isinstance(key, str) else list(key)
+
+
+def _match_keys(columns: list, left: str, right: str) -> str:
+    # NULL-safe equality on every column, for EXISTS-style semi/anti joins.
+    return " AND ".join(f'{left}."{c}" IS NOT DISTINCT FROM {right}."{c}"' for c in columns)
+
+
+def create_table(con: duckdb.DuckDBPyConnection, table: str, spec: dict, replace: bool = False):
+    """
+    Creates the table with explicit types, primary key and secondary indexes.
+    """
+    columns = ", ".join(f'"{name}" {dtype}' for name, dtype in spec["columns"].items())
+    key_columns = _key_columns(spec)
+    primary_key = (", PRIMARY KEY (" + ", ".join(f'"{c}"' for c in key_columns) + ")") if key_columns else ""
+    create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+    con.execute(f'{create} "{table}" ({columns}{primary_key})')
+    for column in spec.get("indexes", []):
+        con.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+
+
+def load_table(con: duckdb.DuckDBPyConnection, table: str, spec: dict, data_path: str, mode: str = "replace") -> int:
+    """
+    Loads one table from its source file(s) without going through pandas.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Read-write connection.
+        table (str): Target table name.
+        spec (dict): Entry of TABLE_SPECS.
+        data_path (str): Directory the spec's source is relative to.
+        mode (str): "replace" rebuilds the table, "append" inserts only rows whose
+                    primary key is new, "merge" inserts new rows and updates
+                    existing ones.
+
+    The rows written are left in the temp table `delta_<table>` (and, for
+    "merge", the replaced rows in `prior_<table>`) for aggregate refreshes.
+
+    Returns:
+        int: Number of rows inserted or updated.
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode '{mode}'. Use one of {LOAD_MODES}.")
+    if not glob.glob(os.path.join(data_path, spec["source"])):
+        raise FileNotFoundError(os.path.join(data_path, spec["source"]))
+
+    source = source_relation(spec, data_path)
+    columns = ", ".join(f'"{name}"' for name in spec["columns"])
+    key_columns = _key_columns(spec)
+
+    create_table(con, table, spec, replace=(mode == "replace"))
+
+    delta_filter = ""
+    if mode == "append" and key_columns:
+        delta_filter = (
+            f' WHERE NOT EXISTS (SELECT 1 FROM "{table}" AS t WHERE {_match_keys(key_columns, "t", "src")})'
+        )
+    con.execute(f'CREATE OR REPLACE TEMP TABLE "delta_{table}" AS SELECT {columns} FROM {source} AS src{delta_filter}')
+
+    if mode == "merge" and key_columns:
+        con.execute(
+            f'CREATE OR REPLACE TEMP TABLE "prior_{table}" AS SELECT * FROM "{table}" AS t '
+            f'WHERE EXISTS (SELECT 1 FROM "delta_{table}" AS d WHERE {_match_keys(key_columns, "t", "d")})'
+        )
+        con.execute(f'INSERT OR REPLACE INTO "{table}" ({columns}) SELECT {columns} FROM "delta_{table}"')
+    else:
+        con.execute(f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "delta_{table}"')
+    return con.execute(f'SELECT count(*) FROM "delta_{table}"').fetchone()[0]
+
+
+def refresh_aggregates(con: duckdb.DuckDBPyConnection, loaded: dict):
+    """
+    Refreshes the materialized aggregates whose source table was just loaded.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Read-write connection.
+        loaded (dict): Source table -> load mode used, for tables loaded in this run.
+    """
+    con.execute(
+        f'CREATE TABLE IF NOT EXISTS "{AGGREGATES_METADATA_TABLE}" '
+        "(name VARCHAR PRIMARY KEY, source_table VARCHAR, description VARCHAR)"
+    )
+    for name, spec in AGGREGATE_SPECS.items():
+        source_table = spec["source_table"]
+        if source_table not in loaded:
+            continue
+        started = time.perf_counter()
+        exists = con.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?", [name]
+        ).fetchone()[0]
+
+        if loaded[source_table] == "replace" or not exists:
+            con.execute(f'CREATE OR REPLACE TABLE "{name}" AS {spec["query"].format(source=source_table)}')
+            how = "rebuilt"
+        else:
+            # Groups touched by new rows, plus (on merge) the groups the replaced rows used to be in.
+            touched = [f'SELECT {", ".join(spec["group_by"])} FROM ({spec["query"].format(source=f"delta_{source_table}")})']
+            if loaded[source_table] == "merge":
+                touched.append(
+                    f'SELECT {", ".join(spec["group_by"])} FROM ({spec["query"].format(source=f"prior_{source_table}")})'
+                )
+            con.execute("CREATE OR REPLACE TEMP TABLE affected_groups AS " + " UNION ".join(touched))
+            match = _match_keys(spec["group_by"], "g", "a")
+            con.execute(f'DELETE FROM "{name}" AS g WHERE EXISTS (SELECT 1 FROM affected_groups AS a WHERE {match})')
+            con.execute(
+                f'INSERT INTO "{name}" SELECT g.* FROM ({spec["query"].format(source=source_table)}) AS g '
+                f'WHERE EXISTS (SELECT 1 FROM affected_groups AS a WHERE {match})'
+            )
+            how = "refreshed incrementally"
+
+        con.execute(
+            f'INSERT OR REPLACE INTO "{AGGREGATES_METADATA_TABLE}" VALUES (?, ?, ?)',
+            [name, source_table, spec["description"]],
+        )
+        print(f"Aggregate '{name}' {how} in {time.perf_counter() - started:.2f}s.")
+
+
+def main(mode: str = "replace", tables: list = None):
     # Define the base directory for data
     # This makes the script runnable from the project root or src/ingest
-    script_dir = os.path.dirname(__file__)
-    project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
     data_path = os.path.join(project_root, 'data', 'structured')
     db_path = os.path.join(data_path, 'allyin_compass.db') # Path for the persistent DuckDB file
 
-    print(f"Attempting to load CSVs from: {data_path}")
+    print(f"Attempting to load structured data from: {data_path} (mode: {mode})")
     print(f"DuckDB database will be saved/loaded from: {db_path}")
 
-    # Initialize DuckDB connection (persistent database)
-    con = None # Initialize con to None
+    # Build into a private copy and swap it in atomically at the end, so readers
+    # (the app's read-only pool) never wait on or see a half-loaded database.
     try:
-        con = duckdb.connect(database=db_path, read_only=False)
-        print("Connected to DuckDB successfully.")
+        with swap_in_database(db_path) as build_path:
+            schema_digest = _load_into(build_path, data_path, mode, tables)
     except Exception as e:
-        print(f"Error connecting to DuckDB at {db_path}: {e}")
-        return # Exit the function if connection fails
+        print(f"Loading failed; {db_path} was left unchanged. Error: {e}")
+        return
+    print(f"\nSwapped the new database into {db_path}.")
 
-    # --- Load customers.csv ---
-    try:
-        customers_csv_path = os.path.join(data_path, 'customers.csv')
-        customers_df = pd.read_csv(customers_csv_path)
-        # Use CREATE OR REPLACE TABLE to ensure it's updated if script is run multiple times
-        con.execute("CREATE OR REPLACE TABLE customers AS SELECT * FROM customers_df")
-        print(f"Successfully loaded '{os.path.basename(customers_csv_path)}' into DuckDB as 'customers' table.")
-    except FileNotFoundError:
-        print(f"Error: '{os.path.basename(customers_csv_path)}' not found at {customers_csv_path}. Please ensure it exists.")
-    except pd.errors.EmptyDataError:
-        print(f"Warning: '{os.path.basename(customers_csv_path)}' is empty. No data loaded for 'customers'.")
-    except Exception as e:
-        print(f"An unexpected error occurred while loading '{os.path.basename(customers_csv_path)}': {e}")
+    # Persist the digest only now: closing checkpoints the file, which changes its fingerprint
+    if schema_digest is not None:
+        save_schema_digest(schema_digest, db_path)
+        print(f"Schema digest saved for {len(schema_digest['tables'])} tables.")
 
-    # --- Load orders.csv ---
-    try:
-        orders_csv_path = os.path.join(data_path, 'orders.csv')
-        orders_df = pd.read_csv(orders_csv_path)
-        con.execute("CREATE OR REPLACE TABLE orders AS SELECT * FROM orders_df")
-        print(f"Successfully loaded '{os.path.basename(orders_csv_path)}' into DuckDB as 'orders' table.")
-    except FileNotFoundError:
-        print(f"Error: '{os.path.basename(orders_csv_path)}' not found at {orders_csv_path}. Please ensure it exists.")
-    except pd.errors.EmptyDataError:
-        print(f"Warning: '{os.path.basename(orders_csv_path)}' is empty. No data loaded for 'orders'.")
-    except Exception as e:
-        print(f"An unexpected error occurred while loading '{os.path.basename(orders_csv_path)}': {e}")
 
-    # --- Load products.csv ---
+def _load_into(build_path: str, data_path: str, mode: str, tables: list = None):
+    """
+    Loads the configured tables into the database at `build_path` and returns
+    its schema digest (None if the digest could not be built).
+    """
+    con = duckdb.connect(database=build_path, read_only=False)
+    print("Connected to DuckDB successfully.")
     try:
-        products_csv_path = os.path.join(data_path, 'products.csv')
-        products_df = pd.read_csv(products_csv_path)
-        con.execute("CREATE OR REPLACE TABLE products AS SELECT * FROM products_df")
-        print(f"Successfully loaded '{os.path.basename(products_csv_path)}' into DuckDB as 'products' table.")
-    except FileNotFoundError:
-        print(f"Error: '{os.path.basename(products_csv_path)}' not found at {products_csv_path}. Please ensure it exists.")
-    except pd.errors.EmptyDataError:
-        print(f"Warning: '{os.path.basename(products_csv_path)}' is empty. No data loaded for 'products'.")
-    except Exception as e:
-        print(f"An unexpected error occurred while loading '{os.path.basename(products_csv_path)}': {e}")
-
-    print("\nStructured data loading attempts complete.")
-
-    # --- Explore DuckDB Tables ---
-    print("\n--- Exploring DuckDB Tables ---")
+        # --- Load each configured table with DuckDB's native readers ---
+        loaded = {}
+        for table, spec in TABLE_SPECS.items():
+            if tables and table not in tables:
+                continue
+            started = time.perf_counter()
+            try:
+                rows = load_table(con, table, spec, data_path, mode)
+                loaded[table] = mode
+                print(f"Loaded {rows} rows from '{spec['source']}' into '{table}' in {time.perf_counter() - started:.2f}s.")
+            except FileNotFoundError:
+                if spec.get("optional"):
+                    print(f"Skipping optional table '{table}': '{spec['source']}' not found.")
+                else:
+                    print(f"Error: '{spec['source']}' not found in {data_path}. Please ensure it exists.")
+            except Exception as e:
+                print(f"An unexpected error occurred while loading '{spec['source']}' into '{table}': {e}")
 
-    # Explore the 'customers' table
-    print("\nTop 10 rows from 'customers' table:")
-    try:
-        customers_sample = con.execute("SELECT * FROM customers LIMIT 10").df()
-        if not customers_sample.empty:
-            print(customers_sample)
-        else:
-            print("No data in 'customers' table.")
-    except Exception as e:
-        print(f"Error exploring 'customers' table: {e}")
+        print("\nStructured data loading attempts complete.")
 
-    # Explore the 'orders' table
-    print("\nTop 10 rows from 'orders' table:")
-    try:
-        orders_sample = con.execute("SELECT * FROM orders LIMIT 10").df()
-        if not orders_sample.empty:
-            print(orders_sample)
-        else:
-            print("No data in 'orders' table.")
-    except Exception as e:
-        print(f"Error exploring 'orders' table: {e}")
+        # --- Refresh materialized aggregates over the tables just loaded ---
+        try:
+            refresh_aggregates(con, loaded)
+        except Exception as e:
+            print(f"Error refreshing materialized aggregates: {e}")
 
-    # Explore the 'products' table
-    print("\nTop 10 rows from 'products' table:")
-    try:
-        products_sample = con.execute("SELECT * FROM products LIMIT 10").df()
-        if not products_sample.empty:
-            print(products_sample)
-        else:
-            print("No data in 'products' table.")
-    except Exception as e:
-        print(f"Error exploring 'products' table: {e}")
+        # --- Explore DuckDB Tables ---
+        print("\n--- Exploring DuckDB Tables ---")
+        for table in loaded:
+            print(f"\nTop 10 rows from '{table}' table:")
+            try:
+                sample = con.execute(f'SELECT * FROM "{table}" LIMIT 10').df()
+                if not sample.empty:
+                    print(sample)
+                else:
+                    print(f"No data in '{table}' table.")
+            except Exception as e:
+                print(f"Error exploring '{table}' table: {e}")
 
-    # Close the DuckDB connection when done
-    if con: # Ensure connection exists before trying to close
+        # --- Build the schema digest used by the SQL agent prompt ---
+        try:
+            return build_schema_digest(con)
+        except Exception as e:
+            print(f"Error building schema digest: {e}")
+            return None
+    finally:
+        # Close the DuckDB connection before the file is swapped in
         con.close()
         print("\nDuckDB connection closed.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Load structured extracts into DuckDB.")
+    parser.add_argument("--mode", choices=LOAD_MODES, default="replace",
+                        help="replace: rebuild tables; append: insert only new keys; merge: upsert by key")
+    parser.add_argument("--tables", nargs="*", help="Only load these tables (default: all)")
+    args = parser.parse_args()
+    main(mode=args.mode, tables=args.tables)
@@ -0,0 +1,159 @@
+# src/llm/llm_client.py
+
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, cast
+
+import google.api_core.exceptions
+from dotenv import load_dotenv
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_google_genai.chat_models import ChatGoogleGenerativeAIError, _response_to_result
+
+from src.llm.rate_limiter import SingleFlight, TokenBucket, retry_with_backoff
+from src.llm.usage_tracker import usage_callback
+
+load_dotenv()
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+# Process-wide limits shared by every component that calls Gemini
+# (COMPASS_LLM_RPM=0 disables rate limiting).
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("COMPASS_LLM_RPM", "60"))
+LLM_BURST = float(os.getenv("COMPASS_LLM_BURST", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("COMPASS_LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("COMPASS_LLM_MAX_RETRIES", "5"))
+
+RETRYABLE_ERRORS = (
+    google.api_core.exceptions.ResourceExhausted,
+    google.api_core.exceptions.ServiceUnavailable,
+    google.api_core.exceptions.DeadlineExceeded,
+    google.api_core.exceptions.InternalServerError,
+)
+
+_rate_limiter = TokenBucket(rate=LLM_REQUESTS_PER_MINUTE / 60.0, capacity=LLM_BURST)
+_concurrency = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_single_flight = SingleFlight()
+
+
+class PooledChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """
+    Gemini chat model whose calls go through the process-wide client pool:
+    token-bucket rate limiting, bounded concurrency, jittered retries and
+    single-flight coalescing of identical in-flight prompts.
+
+    Both entry points are covered: `_generate` (plain invoke) and `_stream`,
+    which LangChain agents use since they stream their runnable. A stream
+    holds its concurrency slot until the last chunk, and only opening it is
+    retried; identical prompts arriving meanwhile replay the leader's chunks.
+    The provider call is made directly (not via langchain-google-genai's own
+    tenacity retry) so the retry policy lives in one place.
+    """
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return _single_flight.do(
+            self._flight_key("generate", messages, stop, kwargs),
+            lambda: retry_with_backoff(
+                lambda: self._send(messages, stop, **kwargs),
+                RETRYABLE_ERRORS,
+                max_retries=LLM_MAX_RETRIES,
+            ),
+        )
+
+    def _flight_key(self, mode: str, messages: List[BaseMessage], stop: Optional[List[str]],
+                    kwargs: Dict[str, Any]) -> tuple:
+        return (
+            mode,
+            self.model,
+            self.temperature,
+            tuple(stop or ()),
+            tuple((m.type, str(m.content)) for m in messages),
+            repr(sorted(kwargs.items())),
+        )
+
+    def _send(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> ChatResult:
+        _rate_limiter.acquire()
+        with _concurrency:
+            params, chat, message = self._prepare_chat(messages, stop=stop, **kwargs)
+            try:
+                response = chat.send_message(content=message, **params)
+            except google.api_core.exceptions.InvalidArgument as e:
+                raise ChatGoogleGenerativeAIError(f"Invalid argument provided to Gemini: {e}") from e
+        return _response_to_result(response)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        chunks = _single_flight.stream(
+            self._flight_key("stream", messages, stop, kwargs),
+            lambda: self._stream_chunks(messages, stop, **kwargs),
+        )
+        for generation in chunks:
+            if run_manager:
+                run_manager.on_llm_new_token(generation.text)
+            yield generation
+
+    def _stream_chunks(self, messages: List[BaseMessage], stop: Optional[List[str]],
+                       **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        with _concurrency:
+            # Only opening the stream is retried (the first chunk arrives with
+            # the response); once tokens have been yielded an error is raised.
+            response = retry_with_backoff(
+                lambda: self._open_stream(messages, stop, **kwargs),
+                RETRYABLE_ERRORS,
+                max_retries=LLM_MAX_RETRIES,
+            )
+            for chunk in response:
+                yield cast(ChatGenerationChunk, _response_to_result(chunk, stream=True).generations[0])
+
+    def _open_stream(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any):
+        _rate_limiter.acquire()
+        params, chat, message = self._prepare_chat(messages, stop=stop, **kwargs)
+        try:
+            return chat.send_message(content=message, **params, stream=True)
+        except google.api_core.exceptions.InvalidArgument as e:
+            raise ChatGoogleGenerativeAIError(f"Invalid argument provided to Gemini: {e}") from e
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str = DEFAULT_MODEL, temperature: float = 0) -> ChatGoogleGenerativeAI:
+    """
+    Returns the shared, instrumented Gemini chat model.
+
+    All components (UI agent, SQL agent, RAG tool, CLI) should obtain their LLM
+    here so every call is counted by the usage tracker and goes through the
+    process-wide rate limiter.
+
+    Args:
+        model (str, optional): Gemini model name. Defaults to "gemini-1.5-flash".
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+
+    Returns:
+        ChatGoogleGenerativeAI: One instance per (model, temperature).
+    """
+    return PooledChatGoogleGenerativeAI(model=model, temperature=temperature, callbacks=[usage_callback])
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Returns the client pool configuration and coalescing counter.
+    """
+    return {
+        "requests_per_minute": LLM_REQUESTS_PER_MINUTE,
+        "burst": LLM_BURST,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "coalesced_calls": _single_flight.coalesced,
+    }
@@ -0,0 +1,143 @@
+# src/llm/rate_limiter.py
+
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Type
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    A rate of 0 (or less) means unlimited: `acquire` never blocks.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        Blocks until `tokens` are available, then consumes them.
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: one caller (the leader) runs the
+    function, every other caller waits for and shares its result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, "_Call"] = {}
+        self.coalesced = 0
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+    def stream(self, key: Any, fn: Callable[[], Iterable[Any]]) -> Iterator[Any]:
+        """
+        Streaming variant of `do`: the leader yields items as `fn()` produces
+        them; callers with the same key that arrive meanwhile wait for the
+        leader to finish and then replay its items. If the leader's consumer
+        stops early, waiting callers run `fn()` themselves.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            yield from (call.result if call.complete else fn())
+            return
+
+        items: List[Any] = []
+        call.result = items
+        try:
+            for item in fn():
+                items.append(item)
+                yield item
+            call.complete = True
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Any = None
+        self.complete = False
+
+
+def retry_with_backoff(fn: Callable[[], Any], retryable: Tuple[Type[BaseException], ...],
+                       max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0) -> Any:
+    """
+    Calls `fn`, retrying `retryable` exceptions with full-jitter exponential backoff.
+
+    Full jitter (sleep uniformly in [0, base * 2**attempt]) keeps callers that
+    failed together from retrying together.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except retryable as e:
+            if attempt >= max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            logging.warning(f"LLM call failed ({type(e).__name__}: {e}); retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,255 @@
+# src/llm/usage_tracker.py
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.observability.metrics_registry import (
+    ERRORS, LLM_CALLS, LLM_LATENCY, LLM_TOKENS, TOOL_CALLS, TOOL_LATENCY, TOOL_LATENCY_RECENT,
+)
+
+# Gemini (langchain-google-genai 0.0.11) does not return usage metadata, so token
+# counts fall back to a character-based estimate when the provider is silent.
+CHARS_PER_TOKEN = 4
+
+_current_usage: ContextVar[Optional["LLMUsage"]] = ContextVar("compass_llm_usage", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate used when the provider does not report usage.
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def split_prompt_components(prompt: str) -> Dict[str, int]:
+    """
+    Splits a rendered prompt into its main components and returns their sizes in characters.
+
+    Recognizes the ReAct layout used by the main agent and the SQL agent
+    (preamble, inlined schema, tool descriptions, format instructions, question,
+    scratchpad)
+    and the RAG layout (question, context).
+
+    Args:
+        prompt (str): The fully rendered prompt text.
+
+    Returns:
+        dict: Component name -> size in characters. Sizes add up to len(prompt).
+    """
+    markers: List[tuple] = []
+
+    schema_at = prompt.find("Schema:")
+    if schema_at != -1:
+        markers.append((schema_at, "schema"))
+
+    tools_at = prompt.find("following tools:")
+    if tools_at != -1:
+        markers.append((tools_at + len("following tools:"), "tool_descriptions"))
+
+    for format_marker in ("Use this format:", "Use the following format:"):
+        format_at = prompt.find(format_marker)
+        if format_at != -1:
+            markers.append((format_at, "instructions"))
+            break
+
+    begin_at = prompt.find("Begin!")
+    question_at = prompt.find("Question:", begin_at if begin_at != -1 else 0)
+    if question_at != -1 and begin_at != -1:
+        markers.append((question_at, "question"))
+        line_end = prompt.find("\n", question_at)
+        if line_end != -1:
+            markers.append((line_end + 1, "scratchpad"))
+    else:
+        user_question_at = prompt.find("User Question:")
+        if user_question_at != -1:
+            markers.append((user_question_at, "question"))
+
+    context_at = prompt.find("Context:")
+    if context_at != -1:
+        markers.append((context_at, "context"))
+
+    markers.sort()
+    sizes: Dict[str, int] = {}
+    position, name = 0, "preamble"
+    for marker_at, marker_name in markers:
+        if marker_at < position:
+            continue
+        sizes[name] = sizes.get(name, 0) + (marker_at - position)
+        position, name = marker_at, marker_name
+    sizes[name] = sizes.get(name, 0) + (len(prompt) - position)
+    return {k: v for k, v in sizes.items() if v > 0}
+
+
+class LLMUsage:
+    """
+    Per-request accumulator for LLM calls, tokens, prompt composition and latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated = False
+        self.llm_latency = 0.0
+        self.prompt_components: Dict[str, int] = {}
+        self.tools: Dict[str, Dict[str, float]] = {}
+
+    def record_llm_call(self, prompt: str, completion: str, latency: float,
+                        token_usage: Optional[Dict[str, int]] = None, error: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.llm_latency += latency
+            if token_usage:
+                self.prompt_tokens += int(token_usage.get("prompt_tokens", 0))
+                self.completion_tokens += int(token_usage.get("completion_tokens", 0))
+            else:
+                self.estimated = True
+                self.prompt_tokens += estimate_tokens(prompt)
+                self.completion_tokens += estimate_tokens(completion)
+            for component, size in split_prompt_components(prompt).items():
+                self.prompt_components[component] = self.prompt_components.get(component, 0) + size
+
+    def record_tool_call(self, tool_name: str, latency: float, error: bool = False):
+        with self._lock:
+            stats = self.tools.setdefault(tool_name, {"calls": 0, "errors": 0, "latency": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["latency"] = round(stats["latency"] + latency, 4)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "tokens_estimated": self.estimated,
+                "llm_latency": round(self.llm_latency, 4),
+                "prompt_chars": dict(self.prompt_components),
+                "tools": {name: dict(stats) for name, stats in self.tools.items()},
+            }
+
+
+# Process-wide totals, updated alongside whichever request is active.
+process_usage = LLMUsage()
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler that feeds LLM and tool events into the active LLMUsage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[UUID, Dict[str, Any]] = {}
+
+    def _start(self, run_id: UUID, **info):
+        with self._lock:
+            self._pending[run_id] = dict(info, started=time.perf_counter(), usage=_current_usage.get())
+
+    def _finish(self, run_id: UUID) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            info = self._pending.pop(run_id, None)
+        if info is not None:
+            info["latency"] = time.perf_counter() - info["started"]
+        return info
+
+    @staticmethod
+    def _targets(info: Dict[str, Any]) -> List[LLMUsage]:
+        return [process_usage] + ([info["usage"]] if info.get("usage") is not None else [])
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, prompt="\n".join(prompts))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        info = self._finish(run_id)
+        if info is None:
+            return
+        completion = "".join(
+            generation.text for generations in response.generations for generation in generations
+        )
+        token_usage = (response.llm_output or {}).get("token_usage") or None
+        for usage in self._targets(info):
+            usage.record_llm_call(info["prompt"], completion, info["latency"], token_usage)
+        _export_llm_call(info, completion, token_usage, error=False)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        info = self._finish(run_id)
+        if info is None:
+            return
+        for usage in self._targets(info):
+            usage.record_llm_call(info["prompt"], "", info["latency"], error=True)
+        _export_llm_call(info, "", None, error=True)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, tool=(serialized or {}).get("name", "unknown"))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        info = self._finish(run_id)
+        if info is not None:
+            for usage in self._targets(info):
+                usage.record_tool_call(info["tool"], info["latency"])
+            _export_tool_call(info, error=False)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        info = self._finish(run_id)
+        if info is not None:
+            for usage in self._targets(info):
+                usage.record_tool_call(info["tool"], info["latency"], error=True)
+            _export_tool_call(info, error=True)
+
+
+def _export_llm_call(info: Dict[str, Any], completion: str, token_usage: Optional[Dict[str, int]], error: bool):
+    # Process-wide Prometheus metrics (src/observability/metrics_registry.py)
+    LLM_CALLS.inc(status="error" if error else "ok")
+    LLM_LATENCY.observe(info["latency"])
+    if error:
+        ERRORS.inc(component="llm")
+        return
+    if token_usage:
+        prompt_tokens, completion_tokens = token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    else:
+        prompt_tokens, completion_tokens = estimate_tokens(info["prompt"]), estimate_tokens(completion)
+    LLM_TOKENS.inc(int(prompt_tokens), kind="prompt")
+    LLM_TOKENS.inc(int(completion_tokens), kind="completion")
+
+
+def _export_tool_call(info: Dict[str, Any], error: bool):
+    TOOL_CALLS.inc(tool=info["tool"], status="error" if error else "ok")
+    TOOL_LATENCY.observe(info["latency"], tool=info["tool"])
+    TOOL_LATENCY_RECENT.observe(info["latency"], tool=info["tool"])
+    if error:
+        ERRORS.inc(component=f"tool:{info['tool']}")
+
+
+usage_callback = UsageCallbackHandler()
+
+
+@contextmanager
+def track_llm_usage():
+    """
+    Scopes LLM accounting to one request.
+
+    Every LLM or tool event observed by `usage_callback` while the block runs
+    (on this thread / context) is recorded into the yielded LLMUsage.
+    """
+    usage = LLMUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        logging.info(f"LLM usage: {usage.to_dict()}")
@@ -0,0 +1,147 @@
+# src/observability/log_writer.py
+
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import logging
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# Rotation policy for the JSONL call logs (override via environment).
+LOG_MAX_BYTES = int(os.getenv("COMPASS_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_MAX_AGE_SECONDS = float(os.getenv("COMPASS_LOG_MAX_AGE_HOURS", "24")) * 3600
+LOG_BACKUP_COUNT = int(os.getenv("COMPASS_LOG_BACKUPS", "10"))
+
+_writers: Dict[str, logging.Logger] = {}
+_listeners = []
+
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Serializes a dict passed as the log message into one compact JSON line.
+    The result is cached on the record, so size checks and emit share one dump.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = getattr(record, "json_line", None)
+        if line is None:
+            payload = record.msg if isinstance(record.msg, dict) else {"message": record.getMessage()}
+            line = json.dumps(payload, ensure_ascii=False, default=str, separators=(",", ":"))
+            record.json_line = line
+        return line
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotates when the file exceeds `maxBytes` or has been written to for longer than
+    `max_age_seconds`. Rotated files are gzip-compressed (`agent_calls.log.1.gz`, ...).
+
+    Age counts from the file's first record, so it survives restarts: a file
+    left by an earlier process is dated by its first line's "timestamp" (or,
+    failing that, the file's creation / modification time).
+    """
+
+    def __init__(self, filename: str, maxBytes: int, backupCount: int, max_age_seconds: float):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding="utf-8", delay=True)
+        self.max_age_seconds = max_age_seconds
+        self._opened_at: Optional[float] = None  # resolved on the first record
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if super().shouldRollover(record):
+            return 1
+        if self._opened_at is None:
+            self._opened_at = _file_started_at(self.baseFilename)
+        if self.max_age_seconds > 0 and time.time() - self._opened_at >= self.max_age_seconds:
+            return int(os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0)
+        return 0
+
+    def doRollover(self):
+        super().doRollover()
+        self._opened_at = time.time()
+
+
+def _file_started_at(path: str) -> float:
+    """
+    When an existing log file was started: the "timestamp" of its first record,
+    else its creation time (where the platform records it) or modification time.
+    Now for a missing or empty file.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return time.time()
+    if stat.st_size == 0:
+        return time.time()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            timestamp = json.loads(f.readline(64 * 1024)).get("timestamp")
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (OSError, ValueError, TypeError, AttributeError):
+        return getattr(stat, "st_birthtime", stat.st_mtime)
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # Skip QueueHandler's eager formatting: serialization happens on the listener thread.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def get_log_writer(log_file: str) -> logging.Logger:
+    """
+    Returns a non-blocking JSONL logger for `log_file`.
+
+    `logger.info(<dict>)` only enqueues the record; a background QueueListener
+    serializes it and appends it to a size/time-rotated, gzip-compressed file.
+
+    Args:
+        log_file (str): Path of the active log file.
+
+    Returns:
+        logging.Logger: A logger that accepts dicts as messages.
+    """
+    log_file = os.path.abspath(log_file)
+    if log_file in _writers:
+        return _writers[log_file]
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = SizeAndTimeRotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, max_age_seconds=LOG_MAX_AGE_SECONDS
+    )
+    file_handler.setFormatter(JsonLineFormatter())
+
+    record_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(record_queue, file_handler)
+    listener.start()
+    _listeners.append((listener, file_handler))
+
+    logger = logging.getLogger(f"compass.log_writer.{log_file}")
+    logger.setLevel(logging.INFO)
+    logger.handlers = [_DeferredQueueHandler(record_queue)]
+    logger.propagate = False
+    _writers[log_file] = logger
+    return logger
+
+
+@atexit.register
+def flush_log_writers():
+    """
+    Drains every queue and closes the files (runs automatically at exit).
+    """
+    while _listeners:
+        listener, file_handler = _listeners.pop()
+        listener.stop()
+        file_handler.close()
+    _writers.clear()
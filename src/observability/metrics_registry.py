@@ -0,0 +1,341 @@
+# src/observability/metrics_registry.py
+
+import os
+import math
+import time
+import atexit
+import bisect
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+# ────────────────────────────────────────────────────────────────────────────────
+# In-process metrics registry with Prometheus text-format exposition.
+#
+# Counters, gauges, histograms (cumulative buckets, aggregatable across
+# processes with histogram_quantile) and summaries (quantiles over a sliding
+# window of recent observations, readable directly from a scrape). Exposed on
+# a local HTTP endpoint (COMPASS_METRICS_PORT, 0 disables) and/or written
+# periodically to a textfile for node_exporter (COMPASS_METRICS_TEXTFILE).
+# ────────────────────────────────────────────────────────────────────────────────
+METRICS_PORT = int(os.getenv("COMPASS_METRICS_PORT", "9464"))
+METRICS_ADDR = os.getenv("COMPASS_METRICS_ADDR", "127.0.0.1")
+METRICS_TEXTFILE = os.getenv("COMPASS_METRICS_TEXTFILE", "")
+TEXTFILE_INTERVAL_SECONDS = float(os.getenv("COMPASS_METRICS_TEXTFILE_SECONDS", "15"))
+SUMMARY_WINDOW = int(os.getenv("COMPASS_METRICS_SUMMARY_WINDOW", "1024"))
+
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(line + "\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    type = "gauge"
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative `le` buckets, plus _sum and _count."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[LabelValues, List[float]] = {}  # per-bucket counts + [sum, count]
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(counts[-1])}")
+        return lines
+
+
+class Summary(_Metric):
+    """
+    Quantiles over the last `window` observations per label set (so they track
+    current behaviour), plus all-time _sum and _count.
+    """
+    type = "summary"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 quantiles: Sequence[float] = DEFAULT_QUANTILES, window: int = SUMMARY_WINDOW):
+        super().__init__(name, documentation, labelnames)
+        self.quantiles = tuple(quantiles)
+        self.window = window
+        self._values: Dict[LabelValues, Tuple[Deque[float], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = (deque(maxlen=self.window), [0.0, 0.0])
+            entry[0].append(value)
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    def quantile(self, q: float, **labels: str) -> float:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            recent = sorted(entry[0]) if entry else []
+        return self._rank(recent, q)
+
+    @staticmethod
+    def _rank(ordered: List[float], q: float) -> float:
+        if not ordered:
+            return math.nan
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, sorted(recent), list(totals)) for key, (recent, totals) in self._values.items())
+        lines = []
+        for key, ordered, (total, count) in items:
+            for q in self.quantiles:
+                labels = _format_labels(self.labelnames, key, ("quantile", _format_value(q)))
+                lines.append(f"{self.name}{labels} {_format_value(self._rank(ordered, q))}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {_format_value(count)}")
+        return lines
+
+
+class Registry:
+    """
+    Named metrics; get-or-create, so modules can declare the same metric safely.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered as {metric.type} {metric.labelnames}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def summary(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Summary:
+        return self._register(Summary, name, documentation, labelnames, quantiles=quantiles)
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Pipeline metrics (updated from the agent, the usage callback, the retrievers
+# and the caches)
+# ────────────────────────────────────────────────────────────────────────────────
+REQUESTS = REGISTRY.counter("compass_requests_total", "Agent requests by route and status.", ["route", "status"])
+REQUEST_LATENCY = REGISTRY.histogram("compass_request_duration_seconds", "Agent request latency.", ["route"])
+FIRST_TOKEN_LATENCY = REGISTRY.histogram(
+    "compass_first_token_seconds", "Time to the first answer token (streamed requests).", ["route"]
+)
+REQUESTS_IN_PROGRESS = REGISTRY.gauge("compass_requests_in_progress", "Agent requests currently running.")
+TOOL_CALLS = REGISTRY.counter("compass_tool_calls_total", "Tool calls by tool and status.", ["tool", "status"])
+TOOL_LATENCY = REGISTRY.histogram("compass_tool_duration_seconds", "Tool call latency.", ["tool"])
+TOOL_LATENCY_RECENT = REGISTRY.summary(
+    "compass_tool_latency_seconds", "Tool call latency quantiles over recent calls.", ["tool"]
+)
+LLM_CALLS = REGISTRY.counter("compass_llm_calls_total", "LLM calls by status.", ["status"])
+LLM_LATENCY = REGISTRY.histogram("compass_llm_duration_seconds", "LLM call latency.")
+LLM_TOKENS = REGISTRY.counter("compass_llm_tokens_total", "LLM tokens by kind (prompt / completion).", ["kind"])
+EMBEDDING_CALLS = REGISTRY.counter("compass_embedding_calls_total", "Query embedding calls by status.", ["status"])
+EMBEDDING_LATENCY = REGISTRY.histogram(
+    "compass_embedding_duration_seconds", "Query embedding latency.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+CACHE_LOOKUPS = REGISTRY.counter("compass_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"])
+ERRORS = REGISTRY.counter("compass_errors_total", "Errors by component.", ["component"])
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Exposition
+# ────────────────────────────────────────────────────────────────────────────────
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes are not worth a log line each
+
+
+def write_textfile(path: str):
+    """
+    Writes the current metrics to `path` atomically (for node_exporter's textfile collector).
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_metrics())
+    os.replace(tmp_path, path)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_metrics_exporters(port: int = METRICS_PORT, addr: str = METRICS_ADDR,
+                            textfile: str = METRICS_TEXTFILE) -> Optional[ThreadingHTTPServer]:
+    """
+    Starts the configured exporters once per process: an HTTP endpoint serving
+    /metrics on `addr:port` (port 0 disables it) and a background writer for
+    `textfile` (empty disables it). A port already in use is logged, not raised.
+
+    Returns:
+        ThreadingHTTPServer or None: The HTTP server, if one was started.
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return None
+        _exporters_started = True
+
+    server = None
+    if port:
+        try:
+            server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="compass-metrics-http", daemon=True).start()
+            logging.info(f"Prometheus metrics at http://{addr}:{port}/metrics")
+        except OSError as e:
+            logging.warning(f"Metrics endpoint not started on {addr}:{port}: {e}")
+
+    if textfile:
+        def write_periodically():
+            while True:
+                try:
+                    write_textfile(textfile)
+                except OSError as e:
+                    logging.warning(f"Could not write metrics textfile {textfile}: {e}")
+                time.sleep(TEXTFILE_INTERVAL_SECONDS)
+
+        threading.Thread(target=write_periodically, name="compass-metrics-textfile", daemon=True).start()
+        atexit.register(lambda: write_textfile(textfile))
+    return server
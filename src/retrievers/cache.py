@@ -0,0 +1,107 @@
+# src/retrievers/cache.py
+
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from src.observability.metrics_registry import CACHE_LOOKUPS
+
+_MISSING = object()
+
+# Per-request lookup counts: name -> {"hits": n, "misses": n}, for named caches,
+# while a trace_cache_lookups() block is active in the current context.
+_active_trace: ContextVar[Optional[Dict[str, Dict[str, int]]]] = ContextVar("compass_cache_trace", default=None)
+
+
+@contextmanager
+def trace_cache_lookups():
+    """
+    Counts hits and misses of every named LRUCache looked up inside the block
+    (in this thread / context only).
+
+    Yields:
+        dict: cache name -> {"hits": int, "misses": int}, filled as lookups happen.
+    """
+    trace: Dict[str, Dict[str, int]] = {}
+    token = _active_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _active_trace.reset(token)
+
+
+def _record_lookup(name: Optional[str], hit: bool):
+    if not name:
+        return
+    CACHE_LOOKUPS.inc(cache=name, result="hit" if hit else "miss")
+    trace = _active_trace.get()
+    if trace is not None:
+        counts = trace.setdefault(name, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with hit/miss/eviction counters and an optional
+    time-to-live (entries older than `ttl` seconds count as misses). Lookups on
+    a named cache are also counted by trace_cache_lookups().
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                _record_lookup(self.name, False)
+                return default
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                _record_lookup(self.name, False)
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            _record_lookup(self.name, True)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
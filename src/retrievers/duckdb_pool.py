@@ -0,0 +1,234 @@
+# src/retrievers/duckdb_pool.py
+
+import os
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+from src.ingest.schema_digest import db_fingerprint
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Managed DuckDB access. Query traffic goes through a bounded pool of read-only
+# cursors; writers build a new database file next to the live one and swap it
+# in with os.replace, so a reload never blocks or breaks in-flight queries.
+#
+# Replacing a file that readers still have open works on Linux / macOS (they
+# keep the old inode). Windows refuses it: there the swap releases this
+# process's readers and retries for COMPASS_DUCKDB_SWAP_TIMEOUT_SECONDS, and
+# fails with an explanation if another process (e.g. the running app) still
+# holds the file.
+# ────────────────────────────────────────────────────────────────────────────────
+POOL_SIZE = int(os.getenv("COMPASS_DUCKDB_POOL_SIZE", "4"))
+THREADS = int(os.getenv("COMPASS_DUCKDB_THREADS", "2"))
+MEMORY_LIMIT = os.getenv("COMPASS_DUCKDB_MEMORY_LIMIT", "1GB")
+CHECKOUT_TIMEOUT_SECONDS = float(os.getenv("COMPASS_DUCKDB_CHECKOUT_TIMEOUT_SECONDS", "30"))
+SWAP_TIMEOUT_SECONDS = float(os.getenv("COMPASS_DUCKDB_SWAP_TIMEOUT_SECONDS", "30"))
+
+CATALOG = "compass"
+
+
+class _Generation:
+    """
+    One read-only view of one version of the database file.
+
+    The file is ATTACHed to a private in-memory instance rather than opened with
+    duckdb.connect(path): DuckDB caches instances by path, which would keep
+    serving the old file after a swap. A cursor keeps its instance (and the
+    replaced file's inode) alive until it is closed, so queries that started
+    before a swap finish against the data they started on.
+    """
+
+    def __init__(self, db_path: str, threads: int, memory_limit: str):
+        self.fingerprint = db_fingerprint(db_path)
+        self.root = duckdb.connect(":memory:", config={"threads": threads, "memory_limit": memory_limit})
+        self.root.execute(f"ATTACH '{db_path.replace(chr(39), chr(39) * 2)}' AS {CATALOG} (READ_ONLY)")
+        self.idle: List[duckdb.DuckDBPyConnection] = []
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        if self.idle:
+            return self.idle.pop()
+        cursor = self.root.cursor()
+        cursor.execute(f"USE {CATALOG}")
+        return cursor
+
+    def retire(self):
+        for cursor in self.idle:
+            cursor.close()
+        self.idle.clear()
+        self.root = None  # the instance is released once the last in-flight cursor closes
+
+
+class DuckDBReadPool:
+    """
+    Bounded pool of read-only cursors over a DuckDB file.
+
+    Every checkout compares the file's fingerprint with the one the pool opened;
+    after a writer swaps in a new file, new checkouts see the new data while
+    cursors already checked out keep the previous version.
+    """
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE, threads: int = THREADS, memory_limit: str = MEMORY_LIMIT):
+        self.db_path = db_path
+        self.size = size
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._generation: Optional[_Generation] = None
+        self._owner: Dict[int, _Generation] = {}
+        self.checkouts = 0
+        self.reloads = 0
+
+    def _current(self) -> _Generation:
+        fingerprint = db_fingerprint(self.db_path)
+        if self._generation is None or self._generation.fingerprint != fingerprint:
+            if self._generation is not None:
+                self._generation.retire()
+                self.reloads += 1
+                logging.info(f"DuckDB file {self.db_path} changed; pool switched to the new version.")
+            self._generation = _Generation(self.db_path, self.threads, self.memory_limit)
+        return self._generation
+
+    def acquire(self, timeout: float = CHECKOUT_TIMEOUT_SECONDS) -> duckdb.DuckDBPyConnection:
+        """
+        Checks out a read-only cursor. Pair every call with `release`.
+
+        Raises:
+            TimeoutError: If all `size` cursors stay busy for `timeout` seconds.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No DuckDB connection available after {timeout:g}s ({self.size} in use).")
+        try:
+            with self._lock:
+                generation = self._current()
+                cursor = generation.cursor()
+                self._owner[id(cursor)] = generation
+                self.checkouts += 1
+            return cursor
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, cursor: duckdb.DuckDBPyConnection):
+        with self._lock:
+            generation = self._owner.pop(id(cursor), None)
+            if generation is not None and generation is self._generation:
+                generation.idle.append(cursor)
+            else:
+                cursor.close()
+        self._slots.release()
+
+    def open_cursor(self) -> duckdb.DuckDBPyConnection:
+        """
+        Opens an unpooled cursor on the current version, for clients that manage
+        their own connections (the SQLAlchemy engine). The caller closes it.
+        """
+        with self._lock:
+            return self._current().root.cursor().execute(f"USE {CATALOG}")
+
+    def detach(self):
+        """
+        Lets go of the current file: idle cursors are closed and the next
+        checkout attaches the file again. In-flight cursors are not affected.
+        """
+        with self._lock:
+            if self._generation is not None:
+                self._generation.retire()
+                self._generation = None
+
+    @contextmanager
+    def connection(self):
+        """
+        Yields a pooled read-only cursor for the duration of the block.
+        """
+        cursor = self.acquire()
+        try:
+            yield cursor
+        finally:
+            self.release(cursor)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": len(self._owner),
+                "idle": len(self._generation.idle) if self._generation else 0,
+                "checkouts": self.checkouts,
+                "reloads": self.reloads,
+                "threads": self.threads,
+                "memory_limit": self.memory_limit,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_read_pool(db_path: str) -> DuckDBReadPool:
+    """
+    Returns the process-wide read pool for `db_path`.
+    """
+    return DuckDBReadPool(os.path.abspath(db_path))
+
+
+def _replace_live_file(build_path: str, db_path: str, timeout: float = SWAP_TIMEOUT_SECONDS):
+    delay = 0.1
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.replace(build_path, db_path)
+            return
+        except PermissionError as e:
+            # Windows: the live file is open. Release this process's readers and
+            # retry while other readers finish their queries.
+            get_read_pool(db_path).detach()
+            if time.monotonic() >= deadline:
+                raise PermissionError(
+                    f"Could not replace {db_path}: the file is still open in another process. "
+                    f"Replacing a DuckDB file while readers have it attached is only supported on "
+                    f"Linux / macOS; on Windows, stop the app (and any other process using the "
+                    f"database) and run the reload again. ({e})"
+                ) from e
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+
+
+@contextmanager
+def swap_in_database(db_path: str):
+    """
+    Writer path: yields the path of a private copy of the database to modify,
+    then atomically replaces `db_path` with it once the block succeeds.
+
+    The copy is taken from the current file (if any), so incremental loads see
+    the existing data. Readers keep querying the old file meanwhile and pick up
+    the new one on their next checkout. On error the copy is discarded and the
+    live file is left untouched, including when the platform cannot replace a
+    file other processes have open (Windows; see above).
+
+    Args:
+        db_path (str): The live database file.
+
+    Yields:
+        str: Path of the working copy. Close every connection to it before the block ends.
+    """
+    build_path = f"{db_path}.building-{os.getpid()}"
+    for suffix in ("", ".wal"):
+        if os.path.exists(build_path + suffix):
+            os.remove(build_path + suffix)
+        if os.path.exists(db_path + suffix):
+            shutil.copyfile(db_path + suffix, build_path + suffix)
+    try:
+        yield build_path
+        if os.path.exists(build_path + ".wal"):
+            # The writer did not checkpoint on close; fold the WAL in before swapping.
+            duckdb.connect(build_path).close()
+        _replace_live_file(build_path, db_path)
+        if os.path.exists(db_path + ".wal"):
+            os.remove(db_path + ".wal")  # already folded into the copy; it must not replay onto the new file
+    finally:
+        for suffix in ("", ".wal"):
+            if os.path.exists(build_path + suffix):
+                os.remove(build_path + suffix)
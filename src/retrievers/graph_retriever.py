@@ -1,9 +1,24 @@
 # src/retrievers/graph_retriever.py
 
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, READ_ACCESS
 import os
+import re
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.retrievers.cache import LRUCache
+from src.retrievers.graph_snapshot import DEFAULT_SNAPSHOT_PATH, GraphSnapshot
+
 # Load environment variables
 load_dotenv()
 
@@ -13,6 +28,172 @@ load_dotenv()
 # NEO4J_USERNAME="neo4j"
 # NEO4J_PASSWORD="your_neo4j_password"
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Driver pool / transaction tuning and the per-query row cap
+# ────────────────────────────────────────────────────────────────────────────────
+MAX_POOL_SIZE = int(os.getenv("COMPASS_NEO4J_MAX_POOL_SIZE", "20"))
+CONNECTION_TIMEOUT_SECONDS = float(os.getenv("COMPASS_NEO4J_CONNECTION_TIMEOUT_SECONDS", "5"))
+ACQUISITION_TIMEOUT_SECONDS = float(os.getenv("COMPASS_NEO4J_ACQUISITION_TIMEOUT_SECONDS", "10"))
+MAX_RETRY_TIME_SECONDS = float(os.getenv("COMPASS_NEO4J_MAX_RETRY_TIME_SECONDS", "10"))
+MAX_CONNECTION_LIFETIME_SECONDS = float(os.getenv("COMPASS_NEO4J_MAX_CONNECTION_LIFETIME_SECONDS", "3600"))
+MAX_RECORDS = int(os.getenv("COMPASS_NEO4J_MAX_RECORDS", "200"))
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Result cache: (graph version, normalized Cypher, parameters) -> records, with a
+# TTL. Loaders bump the version marker node after writing, which empties the
+# cache the next time the version is checked.
+# ────────────────────────────────────────────────────────────────────────────────
+RESULT_CACHE_SIZE = int(os.getenv("COMPASS_GRAPH_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("COMPASS_GRAPH_CACHE_TTL_SECONDS", "600"))
+VERSION_CHECK_SECONDS = float(os.getenv("COMPASS_GRAPH_VERSION_CHECK_SECONDS", "5"))
+
+GRAPH_VERSION_LABEL = "CompassGraphVersion"
+_READ_VERSION = f"MATCH (v:{GRAPH_VERSION_LABEL} {{id: 'graph'}}) RETURN v.version AS version"
+_BUMP_VERSION = (
+    f"MERGE (v:{GRAPH_VERSION_LABEL} {{id: 'graph'}}) "
+    "SET v.version = coalesce(v.version, 0) + 1, v.updated_at = datetime() RETURN v.version AS version"
+)
+
+graph_result_cache = LRUCache(RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL_SECONDS, name="graph_result")
+
+# Backtick-quoted identifiers are kept as-is; string literals, and numbers that
+# follow a comparison operator, a map-key colon, a comma or an opening bracket,
+# become parameters.
+_CYPHER_TOKEN = re.compile(
+    r"(?P<identifier>`(?:[^`]|``)*`)"
+    r"|(?P<comment>//[^\n]*)"
+    r"|(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<prefix>(?:[=<>:,\[]|\bIN)\s*)(?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)(?![\w.])"
+)
+_CYPHER_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+def _unescape(body: str) -> str:
+    return re.sub(r"\\(.)", lambda m: _CYPHER_ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+def extract_parameters(cypher_query: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Rewrites literal values in a Cypher query as `$p0`, `$p1`, ... parameters,
+    so queries that differ only in their values share one cached plan in Neo4j.
+
+    Args:
+        cypher_query (str): The Cypher query string.
+
+    Returns:
+        tuple: (parameterized query, parameters)
+    """
+    params: Dict[str, Any] = {}
+
+    def _replace(match: "re.Match") -> str:
+        if match.group("identifier") or match.group("comment"):
+            return match.group(0)
+        name = f"p{len(params)}"
+        if match.group("string"):
+            params[name] = _unescape(match.group("string")[1:-1])
+            return f"${name}"
+        number = match.group("number")
+        params[name] = float(number) if any(c in number for c in ".eE") else int(number)
+        return f"{match.group('prefix')}${name}"
+
+    return _CYPHER_TOKEN.sub(_replace, cypher_query), params
+
+
+def _clean_cypher(cypher_query: str) -> str:
+    # Strip whitespace and stray fence backticks around the query; backticks
+    # inside it quote identifiers and must be kept.
+    cleaned = cypher_query.strip().strip("`").strip()
+    return re.sub(r"^cypher\s+", "", cleaned, flags=re.IGNORECASE)
+
+
+def normalize_cypher(cypher_query: str) -> str:
+    # Collapse whitespace outside string literals / quoted identifiers (those are parameters or kept verbatim).
+    parts = re.split(r"(`(?:[^`]|``)*`|\$\w+)", cypher_query)
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)).strip().rstrip(";").strip()
+
+
+def bump_graph_version(driver, database: Optional[str] = None) -> int:
+    """
+    Marks the graph as changed. Call after writing to Neo4j so cached graph
+    results are dropped.
+
+    Returns:
+        int: The new graph version.
+    """
+    with driver.session(database=database) as session:
+        return session.execute_write(lambda tx: tx.run(_BUMP_VERSION).single()["version"])
+
+
+def read_graph_version(driver, database: Optional[str] = None) -> Optional[int]:
+    """
+    Returns the current graph version, or None if no loader has set one yet.
+    """
+    with driver.session(database=database, default_access_mode=READ_ACCESS) as session:
+        record = session.execute_read(lambda tx: tx.run(_READ_VERSION).single())
+    return record["version"] if record else None
+
+
+def load_graph_snapshot(path: str = DEFAULT_SNAPSHOT_PATH) -> Optional[GraphSnapshot]:
+    """
+    Loads the exported in-process graph snapshot (see graph_snapshot.py), if any.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = GraphSnapshot.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load graph snapshot from {path}: {e}")
+        return None
+    print(f"Loaded graph snapshot: {snapshot.stats()}")
+    return snapshot
+
+
+class GraphVersionTracker:
+    """
+    Reads the graph version marker at most every `interval` seconds and clears
+    the result cache when it changes.
+    """
+
+    def __init__(self, driver, database: Optional[str] = None, interval: float = VERSION_CHECK_SECONDS):
+        self._driver = driver
+        self._database = database
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._checked_at = float("-inf")
+        self.version: Optional[int] = None
+
+    def current(self) -> Optional[int]:
+        with self._lock:
+            if time.monotonic() - self._checked_at < self._interval:
+                return self.version
+            self._checked_at = time.monotonic()
+        try:
+            version = read_graph_version(self._driver, self._database)
+        except Exception as e:
+            logging.warning(f"Could not read the graph version marker: {e}")
+            return self.version
+        with self._lock:
+            if version != self.version:
+                logging.info(f"Graph version changed ({self.version} -> {version}); clearing graph result cache.")
+                graph_result_cache.clear()
+                self.version = version
+        return version
+
+
+def get_graph_cache_stats() -> Dict[str, Any]:
+    return graph_result_cache.stats()
+
+
+def _read_records(tx, query: str, params: Dict[str, Any], max_records: int) -> Tuple[List[dict], bool]:
+    records: List[dict] = []
+    result = tx.run(query, params)
+    for record in result:  # streamed; stop pulling once the cap is reached
+        if len(records) >= max_records:
+            return records, True
+        records.append(record.data())
+    return records, False
+
+
 def get_graph_retriever():
     """
     Initializes and returns a function to execute Cypher queries against Neo4j.
@@ -20,32 +201,68 @@ def get_graph_retriever():
     uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     username = os.getenv("NEO4J_USERNAME", "neo4j")
     password = os.getenv("NEO4J_PASSWORD", "your_neo4j_password")
+    database = os.getenv("NEO4J_DATABASE") or None
 
     print(f"Connecting to Neo4j at {uri}...")
     try:
-        driver = GraphDatabase.driver(uri, auth=(username, password))
+        # One long-lived driver; sessions borrow connections from its pool.
+        driver = GraphDatabase.driver(
+            uri,
+            auth=(username, password),
+            max_connection_pool_size=MAX_POOL_SIZE,
+            connection_timeout=CONNECTION_TIMEOUT_SECONDS,
+            connection_acquisition_timeout=ACQUISITION_TIMEOUT_SECONDS,
+            max_transaction_retry_time=MAX_RETRY_TIME_SECONDS,
+            max_connection_lifetime=MAX_CONNECTION_LIFETIME_SECONDS,
+            keep_alive=True,
+        )
         driver.verify_connectivity()
+        atexit.register(driver.close)
         print("Connected to Neo4j successfully.")
 
-        def retrieve_graph_data(cypher_query: str):
+        versions = GraphVersionTracker(driver, database)
+        snapshot = load_graph_snapshot()
+
+        def retrieve_graph_data(cypher_query: str, max_records: int = MAX_RECORDS):
             """
-            Executes a Cypher query against the Neo4j database.
+            Executes a Cypher query against the Neo4j database in a managed read
+            transaction (retried by the driver on transient errors), with literal
+            values sent as parameters. Results are served from the graph result
+            cache while the graph version is unchanged and the entry is fresh;
+            simple pattern lookups are answered from the in-process snapshot
+            when it matches the current graph version.
             Args:
                 cypher_query (str): The Cypher query string.
+                max_records (int): Stop reading after this many records.
             Returns:
                 list: A list of dictionaries, where each dictionary represents a record
-                      returned by the Cypher query.
+                      returned by the Cypher query. If the cap was hit, a final
+                      {"_truncated": ...} entry says so.
             """
-            # Ensure the query is stripped of any leading/trailing whitespace or hidden chars
-            cleaned_cypher_query = cypher_query.strip()
-            # AND ALSO remove any backticks (`) that might still be present
-            cleaned_cypher_query = cleaned_cypher_query.replace("`", "") # NEW: Remove backticks
-            print(f"Executing Cypher query:\n{cleaned_cypher_query}")
-            with driver.session() as session:
-                result = session.run(cleaned_cypher_query)
-                records = [record.data() for record in result]
-            print(f"Found {len(records)} records.")
-            return records
+            query, params = extract_parameters(_clean_cypher(cypher_query))
+            key = (versions.current(), normalize_cypher(query), json.dumps(params, sort_keys=True), max_records)
+            cached = graph_result_cache.get(key)
+            if cached is not None:
+                print(f"Graph result cache hit ({len(cached)} records).")
+                return list(cached)
+
+            records = None
+            if snapshot is not None and snapshot.version == key[0]:
+                records = snapshot.run(query, params, max_records=max_records + 1)
+            if records is not None:
+                truncated = len(records) > max_records
+                del records[max_records:]
+                print(f"Answered from graph snapshot: {len(records)} records.")
+            else:
+                print(f"Executing Cypher query:\n{query}\nParameters: {params}")
+                with driver.session(database=database, default_access_mode=READ_ACCESS) as session:
+                    records, truncated = session.execute_read(_read_records, query, params, max_records)
+                print(f"Found {len(records)} records.")
+            if truncated:
+                logging.info(f"Graph query stopped at {max_records} records: {query}")
+                records.append({"_truncated": f"More than {max_records} records; aggregate or add LIMIT/filters."})
+            graph_result_cache.put(key, records)
+            return list(records)
 
         print("Graph retriever initialized successfully.")
         return retrieve_graph_data
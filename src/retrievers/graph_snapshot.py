@@ -0,0 +1,400 @@
+# src/retrievers/graph_snapshot.py
+
+import os
+import re
+import sys
+import json
+import argparse
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# ────────────────────────────────────────────────────────────────────────────────
+# In-process, read-only copy of the Neo4j graph for hot one- and two-hop lookups.
+# Nodes are numbered 0..n-1; each relationship type has CSR adjacency arrays in
+# both directions (offsets + neighbour ids + edge ids). A small MATCH subset is
+# answered locally; run() returns None for anything else so the caller can fall
+# back to Neo4j.
+# ────────────────────────────────────────────────────────────────────────────────
+DEFAULT_SNAPSHOT_PATH = os.getenv(
+    "COMPASS_GRAPH_SNAPSHOT_PATH", os.path.join(project_root, "data", "graph", "snapshot.json")
+)
+
+_IDENT = r"[A-Za-z_]\w*"
+_VALUE = r"\$\w+|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|-?\d+(?:\.\d+)?|true|false|null"
+_NODE = re.compile(rf"\(\s*(?P<var>{_IDENT})?\s*(?::\s*(?P<label>{_IDENT}))?\s*(?P<props>\{{[^}}]*\}})?\s*\)")
+_REL = re.compile(rf"(?P<left><)?-\[\s*(?:{_IDENT})?\s*:\s*(?P<type>{_IDENT})\s*\]-(?P<right>>)?")
+_PROP = re.compile(rf"\s*(?P<key>{_IDENT})\s*:\s*(?P<value>{_VALUE})\s*")
+_CONDITION = re.compile(rf"\s*(?P<var>{_IDENT})\.(?P<key>{_IDENT})\s*=\s*(?P<value>{_VALUE})\s*$", re.IGNORECASE)
+_RETURN_ITEM = re.compile(
+    rf"\s*(?P<expr>(?P<var>{_IDENT})(?:\.(?P<key>{_IDENT}))?)(?:\s+AS\s+(?P<alias>{_IDENT}|`[^`]+`))?\s*$",
+    re.IGNORECASE,
+)
+_QUERY = re.compile(
+    r"^\s*MATCH\s+(?P<pattern>.+?)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"\s+RETURN\s+(?P<distinct>DISTINCT\s+)?(?P<items>.+?)"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_UNSUPPORTED = re.compile(r"\b(OPTIONAL|UNION|WITH|ORDER|SKIP|OR|NOT|CALL|CREATE|MERGE|SET|DELETE|REMOVE|UNWIND)\b", re.IGNORECASE)
+
+_NO_MATCH = object()
+
+
+def _literal(token: str, params: Dict[str, Any]) -> Any:
+    if token.startswith("$"):
+        return params.get(token[1:], _NO_MATCH)
+    if token[0] in "'\"":
+        return re.sub(r"\\(.)", r"\1", token[1:-1])
+    lowered = token.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    return float(token) if "." in token else int(token)
+
+
+class _Adjacency:
+    """
+    CSR adjacency for one relationship type and direction.
+    """
+
+    def __init__(self, node_count: int, edges: List[Tuple[int, int]], reverse: bool):
+        pairs = sorted(
+            ((dst, src, edge_id) if reverse else (src, dst, edge_id)) for edge_id, (src, dst) in enumerate(edges)
+        )
+        self.offsets = array("q", [0] * (node_count + 1))
+        for node, _, _ in pairs:
+            self.offsets[node + 1] += 1
+        for i in range(node_count):
+            self.offsets[i + 1] += self.offsets[i]
+        self.neighbours = array("q", (other for _, other, _ in pairs))
+        self.edge_ids = array("q", (edge_id for _, _, edge_id in pairs))
+
+    def of(self, node: int) -> Iterable[Tuple[int, int]]:
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.neighbours[start:end], self.edge_ids[start:end])
+
+
+class GraphSnapshot:
+    """
+    Array-backed snapshot of a property graph.
+
+    Args:
+        nodes (list): [{"labels": [...], "properties": {...}}, ...]; a node's id is its position.
+        edges (dict): Relationship type -> [[source id, target id], ...].
+        version: The graph version (see graph_retriever) the snapshot was taken at.
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]], edges: Dict[str, List[List[int]]], version: Any = None):
+        self.version = version
+        self._nodes = nodes
+        self._properties = [node.get("properties", {}) for node in nodes]
+        self._labels: Dict[str, array] = {}
+        for node_id, node in enumerate(nodes):
+            for label in node.get("labels", []):
+                self._labels.setdefault(label, array("q")).append(node_id)
+        self._label_sets = [frozenset(node.get("labels", [])) for node in nodes]
+        self._edges = {rel_type: [tuple(pair) for pair in pairs] for rel_type, pairs in edges.items()}
+        self._out = {t: _Adjacency(len(nodes), pairs, reverse=False) for t, pairs in self._edges.items()}
+        self._in = {t: _Adjacency(len(nodes), pairs, reverse=True) for t, pairs in self._edges.items()}
+        self._property_index: Dict[Tuple[Optional[str], str], Dict[Any, List[int]]] = {}
+
+    # ── Persistence ──────────────────────────────────────────────────────────────
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "nodes": self._nodes,
+            "edges": {rel_type: [list(pair) for pair in pairs] for rel_type, pairs in self._edges.items()},
+        }
+
+    def save(self, path: str = DEFAULT_SNAPSHOT_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"), default=str)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_SNAPSHOT_PATH) -> "GraphSnapshot":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["nodes"], data["edges"], data.get("version"))
+
+    @classmethod
+    def from_neo4j(cls, driver, database: Optional[str] = None, exclude_labels: Iterable[str] = ()) -> "GraphSnapshot":
+        """
+        Exports every node and relationship from Neo4j into a snapshot.
+        """
+        excluded = list(exclude_labels)
+        with driver.session(database=database) as session:
+            node_rows = session.run(
+                "MATCH (n) WHERE none(l IN labels(n) WHERE l IN $excluded) "
+                "RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS properties",
+                excluded=excluded,
+            ).data()
+            edge_rows = session.run(
+                "MATCH (a)-[r]->(b) RETURN elementId(a) AS source, type(r) AS type, elementId(b) AS target"
+            ).data()
+        index = {row["id"]: i for i, row in enumerate(node_rows)}
+        nodes = [{"labels": row["labels"], "properties": row["properties"]} for row in node_rows]
+        edges: Dict[str, List[List[int]]] = {}
+        for row in edge_rows:
+            if row["source"] in index and row["target"] in index:
+                edges.setdefault(row["type"], []).append([index[row["source"]], index[row["target"]]])
+        return cls(nodes, edges)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "nodes": len(self._nodes),
+            "labels": {label: len(ids) for label, ids in self._labels.items()},
+            "relationships": {rel_type: len(pairs) for rel_type, pairs in self._edges.items()},
+        }
+
+    # ── Matching ─────────────────────────────────────────────────────────────────
+    def _nodes_with(self, label: Optional[str], key: str, value: Any) -> List[int]:
+        index = self._property_index.get((label, key))
+        if index is None:
+            index = {}
+            candidates = self._labels.get(label, array("q")) if label else range(len(self._nodes))
+            for node_id in candidates:
+                prop = self._properties[node_id].get(key, _NO_MATCH)
+                if prop is not _NO_MATCH and isinstance(prop, (str, int, float, bool)):
+                    index.setdefault(prop, []).append(node_id)
+            self._property_index[(label, key)] = index
+        return index.get(value, [])
+
+    def _node_ok(self, node_id: int, spec: Dict[str, Any]) -> bool:
+        if spec["label"] and spec["label"] not in self._label_sets[node_id]:
+            return False
+        properties = self._properties[node_id]
+        return all(properties.get(key, _NO_MATCH) == value for key, value in spec["props"].items())
+
+    def _candidates(self, spec: Dict[str, Any]) -> Iterable[int]:
+        if spec["props"]:
+            key, value = next(iter(spec["props"].items()))
+            return self._nodes_with(spec["label"], key, value)
+        if spec["label"]:
+            return self._labels.get(spec["label"], array("q"))
+        return range(len(self._nodes))
+
+    def match(self, nodes: List[Dict[str, Any]], rels: List[Dict[str, Any]]) -> Iterable[List[int]]:
+        """
+        Yields node-id paths matching a linear pattern of up to a few hops.
+
+        Each node spec has "label" and "props"; rel i (with "type" and
+        "direction" "->" or "<-") joins node i and node i + 1. A relationship is
+        used at most once per path, as in Cypher.
+        """
+        anchor = next((i for i, spec in enumerate(nodes) if spec["props"]), 0)
+        order = list(range(anchor + 1, len(nodes))) + list(range(anchor - 1, -1, -1))
+
+        def expand(path: Dict[int, int], used: Tuple[int, ...], step: int):
+            if step == len(order):
+                yield [path[i] for i in range(len(nodes))]
+                return
+            target = order[step]
+            source, rel_index = (target - 1, target - 1) if target > anchor else (target + 1, target)
+            rel = rels[rel_index]
+            forward = (rel["direction"] == "->") == (target > anchor)
+            adjacency = (self._out if forward else self._in).get(rel["type"])
+            if adjacency is None:
+                return
+            for neighbour, edge_id in adjacency.of(path[source]):
+                if (rel["type"], edge_id) in used or not self._node_ok(neighbour, nodes[target]):
+                    continue
+                path[target] = neighbour
+                yield from expand(path, used + ((rel["type"], edge_id),), step + 1)
+                del path[target]
+
+        for start in self._candidates(nodes[anchor]):
+            if self._node_ok(start, nodes[anchor]):
+                yield from expand({anchor: start}, (), 0)
+
+    # ── Query subset ─────────────────────────────────────────────────────────────
+    def run(self, cypher_query: str, params: Optional[Dict[str, Any]] = None,
+            max_records: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Answers `MATCH <pattern> [WHERE a.x = v AND ...] RETURN [DISTINCT] v | v.x [AS alias], ... [LIMIT n]`
+        for linear patterns of 0-2 directed, typed hops with inline property maps.
+        Values may be literals or $parameters.
+
+        Returns:
+            list: Records as dictionaries (same shape as Neo4j's record.data()),
+                  or None if the query is outside the supported subset.
+        """
+        params = params or {}
+        parsed = _parse(cypher_query, params)
+        if parsed is None:
+            return None
+        if not parsed:
+            return []
+        nodes, rels, returns, distinct, limit = parsed
+        if max_records is not None:
+            limit = min(limit, max_records) if limit is not None else max_records
+
+        records: List[Dict[str, Any]] = []
+        seen = set()
+        for path in self.match(nodes, rels):
+            record = {}
+            for alias, position, key in returns:
+                properties = self._properties[path[position]]
+                record[alias] = dict(properties) if key is None else properties.get(key)
+            if distinct:
+                fingerprint = json.dumps(record, sort_keys=True, default=str)
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+            records.append(record)
+            if limit is not None and len(records) >= limit:
+                break
+        return records
+
+
+@lru_cache(maxsize=1024)
+def _compile(cypher_query: str):
+    """
+    Parses a query of the supported subset once; values stay unbound tokens.
+    Returns (nodes, rels, filters, returns, distinct, limit) or None.
+    """
+    query = _QUERY.match(cypher_query)
+    if not query or _UNSUPPORTED.search(_strip_strings(cypher_query)):
+        return None
+
+    # Pattern: node (rel node){0,2}; inline property maps become filters
+    pattern = query.group("pattern").strip()
+    nodes: List[Optional[str]] = []
+    rels: List[Dict[str, str]] = []
+    filters: List[Tuple[int, str, str]] = []
+    variables: Dict[str, int] = {}
+    position = 0
+    while True:
+        node = _NODE.match(pattern, position)
+        if not node:
+            return None
+        if node.group("props"):
+            for item in _split_top_level(node.group("props")[1:-1].strip()):
+                prop = _PROP.fullmatch(item)
+                if not prop:
+                    return None
+                filters.append((len(nodes), prop.group("key"), prop.group("value")))
+        var = node.group("var")
+        if var:
+            if var in variables:
+                return None  # repeated variables (cycles) are left to Neo4j
+            variables[var] = len(nodes)
+        nodes.append(node.group("label"))
+        position = node.end()
+        while position < len(pattern) and pattern[position].isspace():
+            position += 1
+        if position == len(pattern):
+            break
+        rel = _REL.match(pattern, position)
+        if not rel or bool(rel.group("left")) == bool(rel.group("right")) or len(rels) == 2:
+            return None
+        rels.append({"type": rel.group("type"), "direction": "<-" if rel.group("left") else "->"})
+        position = rel.end()
+        while position < len(pattern) and pattern[position].isspace():
+            position += 1
+
+    # WHERE: conjunction of var.key = value
+    if query.group("where"):
+        for condition in re.split(r"\s+AND\s+", query.group("where"), flags=re.IGNORECASE):
+            where = _CONDITION.match(condition)
+            if not where or where.group("var") not in variables:
+                return None
+            filters.append((variables[where.group("var")], where.group("key"), where.group("value")))
+
+    # RETURN: var or var.key, optionally aliased
+    returns: List[Tuple[str, int, Optional[str]]] = []
+    for item in _split_top_level(query.group("items")):
+        returned = _RETURN_ITEM.match(item)
+        if not returned or returned.group("var") not in variables:
+            return None
+        alias = (returned.group("alias") or returned.group("expr")).strip("`")
+        returns.append((alias, variables[returned.group("var")], returned.group("key")))
+
+    limit = int(query.group("limit")) if query.group("limit") else None
+    return tuple(nodes), tuple(rels), tuple(filters), tuple(returns), bool(query.group("distinct")), limit
+
+
+def _parse(cypher_query: str, params: Dict[str, Any]):
+    """
+    Binds a compiled query to `params`. Returns (nodes, rels, returns, distinct,
+    limit), [] if the filters contradict each other, or None if unsupported.
+    """
+    compiled = _compile(cypher_query)
+    if compiled is None:
+        return None
+    labels, rels, filters, returns, distinct, limit = compiled
+    nodes = [{"label": label, "props": {}} for label in labels]
+    for position, key, token in filters:
+        value = _literal(token, params)
+        if value is _NO_MATCH:
+            return None
+        props = nodes[position]["props"]
+        if props.get(key, value) != value:
+            return []  # contradictory filters: matches nothing
+        props[key] = value
+    return nodes, list(rels), list(returns), distinct, limit
+
+
+def _strip_strings(cypher_query: str) -> str:
+    return re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`", "''", cypher_query)
+
+
+def _split_top_level(text: str) -> List[str]:
+    # Split on commas outside quotes/brackets.
+    parts, depth, quote, current = [], 0, None, []
+    for ch in text:
+        if quote:
+            current.append(ch)
+            if ch == quote:
+                quote = None
+            continue
+        if ch in "'\"`":
+            quote = ch
+        elif ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Neo4j graph to an in-process snapshot file.")
+    parser.add_argument("--output", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot JSON path")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from neo4j import GraphDatabase
+    from src.retrievers.graph_retriever import GRAPH_VERSION_LABEL, read_graph_version
+
+    load_dotenv()
+    driver = GraphDatabase.driver(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        auth=(os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "your_neo4j_password")),
+    )
+    try:
+        database = os.getenv("NEO4J_DATABASE") or None
+        # Read the version first: a write during the export then makes the snapshot look stale, not fresh.
+        version = read_graph_version(driver, database)
+        snapshot = GraphSnapshot.from_neo4j(driver, database, exclude_labels=[GRAPH_VERSION_LABEL])
+        snapshot.version = version
+        snapshot.save(args.output)
+        print(f"Graph snapshot saved to {args.output}: {snapshot.stats()}")
+    finally:
+        driver.close()
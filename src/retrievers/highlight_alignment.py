@@ -0,0 +1,210 @@
+# src/retrievers/highlight_alignment.py
+
+import os
+import re
+import sys
+import time
+import random
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Source-highlight alignment: which sentences of an answer are supported by the
+# retrieved passages, and where.
+#
+# A passage is indexed once as hashed word shingles (SHINGLE_SIZE consecutive
+# lowercased words) in a sorted array, so the shingles of a whole answer are
+# looked up with one vectorized binary search. The matches of each sentence are
+# grouped into windows of the passage; the window holding most of the sentence's
+# shingles is its supporting span, and the share of shingles found there is the
+# score. Indexing is linear in the passage (and cached), alignment costs
+# answer shingles × log(passage words): no pairwise string comparison.
+#
+# Offsets are character offsets into the answer and the passage, so spans can
+# be marked directly.
+# ────────────────────────────────────────────────────────────────────────────────
+SHINGLE_SIZE = 2
+MIN_SCORE = float(os.getenv("COMPASS_HIGHLIGHT_MIN_SCORE", "0.4"))
+MIN_SENTENCE_WORDS = 4
+# Shingles occurring more often than this in a passage ("of the", "in the")
+# say nothing about where a sentence comes from and are not used for voting.
+MAX_POSTINGS = 64
+
+_WORD = re.compile(r"\w+")
+_SENTENCE = re.compile(r"\S.*?(?:[.!?]+(?=\s)|(?=\n)|$)", re.DOTALL)
+_HASH_MULTIPLIER = np.int64(1_000_003)
+
+
+class Alignment(NamedTuple):
+    """An answer sentence and its supporting span in passage number `passage`."""
+    answer_start: int
+    answer_end: int
+    passage: int
+    source_start: int
+    source_end: int
+    score: float
+
+
+def _tokenize(text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Word hashes plus start / end offsets, computed with C-level passes only:
+    # the offsets are running sums of word and separator lengths.
+    words = _WORD.findall(text)
+    count = len(words)
+    if not count:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    word_lengths = np.fromiter(map(len, words), dtype=np.int64, count=count)
+    gap_lengths = np.fromiter(map(len, _WORD.split(text)), dtype=np.int64, count=count + 1)
+    ends = np.cumsum(word_lengths) + np.cumsum(gap_lengths[:-1])
+    hashes = np.fromiter(map(hash, map(str.lower, words)), dtype=np.int64, count=count)
+    return hashes, ends - word_lengths, ends
+
+
+def _shingles(hashes: np.ndarray) -> np.ndarray:
+    # Key of the shingle starting at each word (wrapping int64 arithmetic).
+    count = len(hashes) - SHINGLE_SIZE + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+    keys = hashes[:count].copy()
+    for offset in range(1, SHINGLE_SIZE):
+        keys = keys * _HASH_MULTIPLIER + hashes[offset:offset + count]
+    return keys
+
+
+class PassageIndex:
+    """
+    Sorted shingle index of one passage: `keys[i]` is a shingle hash and
+    `positions[i]` the word at which it starts; `starts` / `ends` map words
+    back to character offsets.
+    """
+
+    def __init__(self, text: str):
+        hashes, self.starts, self.ends = _tokenize(text)
+        keys = _shingles(hashes)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.positions = order
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def best_span(self, keys: np.ndarray) -> Optional[Tuple[int, int, float]]:
+        """
+        Finds the passage window containing most of the given shingles.
+
+        Returns:
+            tuple: (start, end, score) as character offsets and the share of
+                   shingles found in the window, or None if none matched.
+        """
+        if not len(keys) or not len(self.keys):
+            return None
+        lows = np.searchsorted(self.keys, keys, side="left")
+        highs = np.searchsorted(self.keys, keys, side="right")
+        # Windows of twice the sentence length, on two grids shifted by half a
+        # window so that a span crossing one grid's boundary fits in the other.
+        width = max(2 * (len(keys) + SHINGLE_SIZE), 16)
+        votes: Dict[Tuple[int, int], Dict[int, List[int]]] = {}
+        for shingle, (low, high) in enumerate(zip(lows.tolist(), highs.tolist())):
+            if not 0 < high - low <= MAX_POSTINGS:
+                continue
+            for position in self.positions[low:high].tolist():
+                for window in ((0, position // width), (1, (position + width // 2) // width)):
+                    votes.setdefault(window, {}).setdefault(shingle, []).append(position)
+        if not votes:
+            return None
+        matched = max(votes.values(), key=len)
+        positions = [position for found in matched.values() for position in found]
+        first, last = min(positions), max(positions) + SHINGLE_SIZE - 1
+        return int(self.starts[first]), int(self.ends[last]), len(matched) / len(keys)
+
+
+@lru_cache(maxsize=16)
+def get_passage_index(text: str) -> PassageIndex:
+    """
+    Returns the (cached) index of a passage, so a document retrieved again,
+    or highlighted again on a UI rerun, is not re-indexed.
+    """
+    return PassageIndex(text)
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Character spans of the sentences of a text (split after . ! ? and at line breaks).
+    """
+    return [(m.start(), m.end()) for m in _SENTENCE.finditer(text)]
+
+
+def align_answer(answer: str, passages: Sequence[str], min_score: float = MIN_SCORE) -> List[Alignment]:
+    """
+    Maps answer sentences to the passage spans that support them.
+
+    Args:
+        answer (str): The generated answer.
+        passages (list): Retrieved texts (tool observations, document contents).
+        min_score (float, optional): Minimum share of a sentence's shingles that
+                                     must be found in one passage window.
+
+    Returns:
+        list: One Alignment per supported sentence (its best passage), in answer order.
+    """
+    indexes = [get_passage_index(passage) for passage in passages if passage]
+    passage_numbers = [number for number, passage in enumerate(passages) if passage]
+    if not answer or not indexes:
+        return []
+    hashes, starts, _ = _tokenize(answer)
+    alignments: List[Alignment] = []
+    for sentence_start, sentence_end in sentence_spans(answer):
+        first, last = np.searchsorted(starts, [sentence_start, sentence_end])
+        if last - first < MIN_SENTENCE_WORDS:
+            continue
+        keys = _shingles(hashes[first:last])
+        best = None
+        for number, index in zip(passage_numbers, indexes):
+            span = index.best_span(keys)
+            if span is not None and (best is None or span[2] > best.score):
+                best = Alignment(sentence_start, sentence_end, number, span[0], span[1], span[2])
+        if best is not None and best.score >= min_score:
+            alignments.append(best)
+    return alignments
+
+
+def benchmark_alignment(pages: int = 200, words_per_page: int = 500, answer_sentences: int = 20) -> Dict[str, float]:
+    """
+    Times aligning an answer that quotes (loosely) a synthetic document, the
+    first time and with the document index cached (ms).
+    """
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(5000)] + ["the", "of", "and", "in", "to"] * 200
+    words = [rng.choice(vocabulary) for _ in range(pages * words_per_page)]
+    document = ". ".join(" ".join(words[i:i + 15]) for i in range(0, len(words), 15)) + "."
+    sentences = []
+    for _ in range(answer_sentences):
+        start = rng.randrange(len(words) - 20)
+        quoted = words[start:start + 15]
+        quoted[rng.randrange(15)] = "paraphrased"
+        sentences.append(" ".join(quoted) + ".")
+    answer = " ".join(sentences)
+    get_passage_index.cache_clear()
+    started = time.perf_counter()
+    align_answer(answer, [document])
+    cold = time.perf_counter()
+    alignments = align_answer(answer, [document])
+    warm = time.perf_counter()
+    return {
+        "document_chars": len(document),
+        "first_ms": round((cold - started) * 1000, 2),  # includes indexing the document
+        "cached_ms": round((warm - cold) * 1000, 2),
+        "aligned_sentences": len(alignments),
+    }
+
+if __name__ == "__main__":
+    source = ("Commercial real estate markets face rising vacancy rates. Office demand has fallen since 2020, "
+              "and refinancing risk is concentrated in loans maturing over the next two years.")
+    answer = "The main risk is refinancing: refinancing risk is concentrated in loans maturing over the next two years. Prices may recover."
+    for alignment in align_answer(answer, [source]):
+        print(f"{answer[alignment.answer_start:alignment.answer_end]!r} <- "
+              f"{source[alignment.source_start:alignment.source_end]!r} ({alignment.score:.2f})")
+    if "--benchmark" in sys.argv:
+        print("200-page document:", benchmark_alignment())
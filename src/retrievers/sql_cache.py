@@ -0,0 +1,83 @@
+# src/retrievers/sql_cache.py
+
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from src.ingest.schema_digest import db_fingerprint
+from src.retrievers.cache import LRUCache
+
+QUESTION_CACHE_SIZE = int(os.getenv("COMPASS_SQL_QUESTION_CACHE_SIZE", "1024"))
+RESULT_CACHE_SIZE = int(os.getenv("COMPASS_SQL_RESULT_CACHE_SIZE", "256"))
+
+_MISSING = object()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Two-level SQL cache, keyed on the database file version:
+#   question_cache: normalized question -> SQL the agent generated for it
+#   result_cache:   normalized SQL      -> guarded result (Arrow table) from DuckDB
+# ────────────────────────────────────────────────────────────────────────────────
+question_cache = LRUCache(QUESTION_CACHE_SIZE, name="sql_question")
+result_cache = LRUCache(RESULT_CACHE_SIZE, name="sql_result")
+
+_version_lock = threading.Lock()
+_cached_version: Dict[str, str] = {}
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.! ").lower()
+
+
+def normalize_sql(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+def db_version(db_path: str) -> str:
+    """
+    Returns the current version of the database file. When it differs from the
+    version the caches were filled under (e.g. structured_loader rewrote a
+    table), both caches are cleared.
+    """
+    version = db_fingerprint(db_path)
+    with _version_lock:
+        if _cached_version.get(db_path) != version:
+            if db_path in _cached_version:
+                clear_sql_caches()
+            _cached_version[db_path] = version
+    return version
+
+
+def clear_sql_caches():
+    question_cache.clear()
+    result_cache.clear()
+
+
+def remember_question_sql(question: str, sql: str, db_path: str):
+    """
+    Records `sql` as the query that answered `question` under the current
+    database version. Only call this once the answer is known to be good.
+    """
+    question_cache.put((db_version(db_path), normalize_question(question)), sql)
+
+
+def lookup_question_sql(question: str, db_path: str) -> Optional[str]:
+    return question_cache.get((db_version(db_path), normalize_question(question)))
+
+
+def cached_query(sql: str, db_path: str, execute: Callable[[], Any]) -> Any:
+    """
+    Returns the cached result for `sql`, executing and caching it on a miss.
+    """
+    version = db_version(db_path)
+    key = (version, normalize_sql(sql))
+    result = result_cache.get(key, _MISSING)
+    if result is _MISSING:
+        result = execute()
+        result_cache.put(key, result)
+    return result
+
+
+def get_sql_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {"question_cache": question_cache.stats(), "result_cache": result_cache.stats()}
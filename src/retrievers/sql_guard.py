@@ -0,0 +1,212 @@
+# src/retrievers/sql_guard.py
+
+import os
+import re
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+import duckdb
+import pyarrow as pa
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Cost guard for agent-generated SQL: statement checks, EXPLAIN-based cost
+# estimates, LIMIT injection, a per-query timeout and result summarization.
+# Results stay Arrow tables end to end; only the rows shown to the LLM are
+# converted to Python values.
+# ────────────────────────────────────────────────────────────────────────────────
+MAX_RESULT_ROWS = int(os.getenv("COMPASS_SQL_MAX_ROWS", "50"))
+MAX_TABLE_ROWS = int(os.getenv("COMPASS_SQL_MAX_TABLE_ROWS", "5000"))
+MAX_PLAN_ROWS = int(os.getenv("COMPASS_SQL_MAX_PLAN_ROWS", "50000000"))
+QUERY_TIMEOUT_SECONDS = float(os.getenv("COMPASS_SQL_TIMEOUT_SECONDS", "10"))
+MAX_VALUE_LENGTH = 300
+
+_READ_ONLY_START = re.compile(r"^\s*(?:\(\s*)*(SELECT|WITH|FROM|VALUES|TABLE|DESCRIBE|SHOW|SUMMARIZE)\b", re.IGNORECASE)
+_METADATA_STATEMENT = re.compile(r"^\s*(DESCRIBE|SHOW|SUMMARIZE)\b", re.IGNORECASE)
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+\d+(?:\s+OFFSET\s+\d+)?\s*$", re.IGNORECASE)
+_PLAN_ESTIMATE = re.compile(r"~([\d,]+)\s+rows?\b|\bEC:\s*(\d+)", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+_collected_results: ContextVar[Optional[List["GuardedResult"]]] = ContextVar("compass_sql_results", default=None)
+
+
+class SQLGuardError(ValueError):
+    """Raised when a generated query is rejected by the cost guard."""
+
+
+def _strip_sql(sql: str) -> str:
+    sql = re.sub(r"--[^\n]*", " ", sql)
+    sql = re.sub(r"/\*.*?\*/", " ", sql, flags=re.DOTALL)
+    return sql.strip().rstrip(";").strip()
+
+
+def check_statement(sql: str) -> str:
+    """
+    Validates that `sql` is a single read-only statement and returns it cleaned
+    (comments and trailing semicolon removed).
+
+    Raises:
+        SQLGuardError: For empty, multi-statement or non-read-only SQL.
+    """
+    cleaned = _strip_sql(sql)
+    if not cleaned:
+        raise SQLGuardError("Empty query.")
+    if ";" in _STRING_LITERAL.sub("''", cleaned):
+        raise SQLGuardError("Only one SQL statement can be run at a time.")
+    if not _READ_ONLY_START.match(cleaned):
+        raise SQLGuardError("Only read-only SELECT queries are allowed.")
+    return cleaned
+
+
+def estimate_plan_rows(con: duckdb.DuckDBPyConnection, sql: str) -> Optional[int]:
+    """
+    Returns the largest row estimate of any operator in DuckDB's EXPLAIN plan,
+    or None if the plan carries no estimates.
+    """
+    plan = "\n".join(str(row[-1]) for row in con.execute(f"EXPLAIN {sql}").fetchall())
+    estimates = [int((a or b).replace(",", "")) for a, b in _PLAN_ESTIMATE.findall(plan)]
+    return max(estimates) if estimates else None
+
+
+def inject_limit(sql: str, limit: int) -> str:
+    """
+    Appends `LIMIT limit` unless the statement already ends with a LIMIT clause.
+    """
+    if _TRAILING_LIMIT.search(sql):
+        return sql
+    return f"{sql}\nLIMIT {limit}"
+
+
+def fetch_arrow(con: duckdb.DuckDBPyConnection) -> pa.Table:
+    """
+    Fetches the pending result as an Arrow table: to_arrow_table() on DuckDB
+    versions that have it (fetch_arrow_table() is deprecated there), the old
+    name otherwise.
+    """
+    to_arrow_table = getattr(con, "to_arrow_table", None)
+    return to_arrow_table() if to_arrow_table is not None else con.fetch_arrow_table()
+
+
+def _short(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + "..."
+    return value
+
+
+class GuardedResult:
+    """
+    Result of a guarded query as an Arrow table (at most MAX_TABLE_ROWS rows),
+    plus the total row count and the number of rows the LLM gets to see.
+    """
+
+    def __init__(self, sql: str, table: pa.Table, total_rows: Optional[int], max_rows: int = MAX_RESULT_ROWS):
+        self.sql = sql
+        self.table = table
+        self.total_rows = total_rows
+        self.max_rows = max_rows
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_rows is None or self.total_rows > self.max_rows
+
+    def rows(self, limit: Optional[int] = None) -> List[tuple]:
+        """
+        The first `limit` rows (default: the rows shown to the LLM) as tuples.
+        """
+        head = self.table.slice(0, self.max_rows if limit is None else limit)
+        return list(zip(*(column.to_pylist() for column in head.columns)))
+
+    def render(self) -> str:
+        """
+        Compact text for the LLM: a header line and one pipe-separated line per
+        row, preceded by a row-count summary when the result was truncated.
+        """
+        rows = self.rows()
+        if not rows:
+            return ""
+        lines = [" | ".join(self.columns)]
+        lines.extend(" | ".join("NULL" if v is None else str(_short(v)) for v in row) for row in rows)
+        if self.truncated:
+            total = f"{self.total_rows}" if self.total_rows is not None else f"more than {self.table.num_rows}"
+            lines.insert(0, f"{total} rows in total; showing the first {len(rows)}.")
+        return "\n".join(lines)
+
+
+@contextmanager
+def collect_results():
+    """
+    While active, every SQL result produced on this thread / context (guarded
+    agent queries and template lookups) is appended to the yielded list, so the
+    caller can show the Arrow tables behind an answer.
+    """
+    results: List[GuardedResult] = []
+    token = _collected_results.set(results)
+    try:
+        yield results
+    finally:
+        _collected_results.reset(token)
+
+
+def record_result(result: GuardedResult):
+    results = _collected_results.get()
+    if results is not None:
+        results.append(result)
+
+
+def run_guarded_query(con: duckdb.DuckDBPyConnection, sql: str, max_rows: int = MAX_RESULT_ROWS,
+                      max_plan_rows: int = MAX_PLAN_ROWS, timeout: float = QUERY_TIMEOUT_SECONDS) -> GuardedResult:
+    """
+    Runs agent-generated SQL under the cost guard.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): A connection (or cursor) dedicated to this call.
+        sql (str): The generated SQL.
+        max_rows (int): Rows rendered for the LLM; larger results are summarized.
+        max_plan_rows (int): Reject plans whose estimated intermediate size exceeds this.
+        timeout (float): Seconds before the query is interrupted.
+
+    Returns:
+        GuardedResult: The result, as an Arrow table of at most MAX_TABLE_ROWS rows.
+
+    Raises:
+        SQLGuardError: If the query is rejected or times out.
+        duckdb.Error: If DuckDB fails to plan or run the query.
+    """
+    cleaned = check_statement(sql)
+    estimate = estimate_plan_rows(con, cleaned)
+    if estimate is not None and estimate > max_plan_rows:
+        raise SQLGuardError(
+            f"Query rejected: the plan is estimated to process ~{estimate:,} rows "
+            f"(limit {max_plan_rows:,}). Add filters or aggregate before joining."
+        )
+
+    # Fetch up to MAX_TABLE_ROWS (+1 to detect overflow) straight into Arrow.
+    table_rows = max(max_rows, MAX_TABLE_ROWS)
+    limited = cleaned if _METADATA_STATEMENT.match(cleaned) else inject_limit(cleaned, table_rows + 1)
+    timer = threading.Timer(timeout, con.interrupt)
+    timer.start()
+    try:
+        con.execute(limited)
+        table = fetch_arrow(con)
+        total_rows = table.num_rows
+        if table.num_rows > table_rows:
+            table = table.slice(0, table_rows)
+            try:
+                total_rows = con.execute(f"SELECT count(*) FROM ({cleaned}) AS guarded_count").fetchone()[0]
+            except duckdb.InterruptException:
+                total_rows = None  # counting ran out of time; the head is still useful
+    except duckdb.InterruptException:
+        raise SQLGuardError(f"Query timed out after {timeout:g}s. Simplify it or add filters.")
+    finally:
+        timer.cancel()
+
+    result = GuardedResult(limited, table, total_rows, max_rows)
+    if result.truncated:
+        logging.info(f"SQL guard truncated result to {max_rows} of {total_rows} rows: {cleaned}")
+    return result
@@ -1,44 +1,169 @@
 # src/retrievers/sql_retriever.py
 
 import os
+import sys
 import duckdb
+from typing import Any, Dict, List, Optional
 from langchain_community.utilities import SQLDatabase
-from langchain_community.agent_toolkits import create_sql_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_community.agent_toolkits import create_sql_agent, SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import QuerySQLCheckerTool
+from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
+from duckdb_engine import ConnectionWrapper
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.exc import SQLAlchemyError
 from langchain.agents import AgentType
 
 load_dotenv() # Loads variables from .env into environment
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.llm.llm_client import get_llm
+from src.retrievers.sql_templates import answer_from_template
+from src.retrievers.sql_cache import cached_query, lookup_question_sql, remember_question_sql
+from src.retrievers.sql_guard import GuardedResult, SQLGuardError, record_result, run_guarded_query
+from src.retrievers.duckdb_pool import DuckDBReadPool, get_read_pool
+from src.ingest.schema_digest import (
+    build_schema_digest, db_fingerprint, load_schema_digest, render_schema_digest, save_schema_digest,
+)
+
+# ReAct prompt with the precomputed schema inlined, so the agent can go straight
+# to writing SQL instead of spending steps on table listing / schema lookups.
+SQL_DIGEST_PROMPT = """You are an agent designed to answer questions from a {dialect} database.
+The complete schema is given below, so you do not need to explore the database: write one syntactically correct {dialect} query, run it with the query tool, and answer from its result.
+Unless the user asks for a specific number of results, limit the query to at most {top_k} rows. Only select the columns you need.
+Tables marked "precomputed summary" already hold aggregated results: prefer them over aggregating the base tables when they answer the question.
+If the query fails, correct it using the schema below and try again. Never run DML statements (INSERT, UPDATE, DELETE, DROP etc.).
+If the question is not about this database, answer "I don't know".
+
+Tables: {table_names}
+
+Schema:
+{table_info}
+
+You have access to the following tools:
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+
+class DigestSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase whose table list and schema text come from the persisted schema
+    digest instead of re-introspecting DuckDB (and sampling rows) on every call.
+    Agent queries run under the SQL cost guard and go through the versioned
+    SQL result cache, which holds their Arrow results; the agent sees a compact
+    text rendering and the Arrow table is recorded for the UI.
+    """
+
+    def __init__(self, engine, schema_digest: Dict[str, Any], db_path: str, pool: DuckDBReadPool, **kwargs):
+        self._schema_digest = schema_digest
+        self._db_path = db_path
+        self._pool = pool
+        super().__init__(engine, lazy_table_reflection=True, **kwargs)
+
+    def _run_guarded(self, command: str) -> GuardedResult:
+        with self._pool.connection() as cursor:
+            return run_guarded_query(cursor, command)
+
+    def run(self, command, fetch="all", include_columns=False, **kwargs):
+        if fetch != "all" or not isinstance(command, str) or kwargs.get("parameters"):
+            return super().run(command, fetch, include_columns, **kwargs)
+        result = cached_query(command, self._db_path, lambda: self._run_guarded(command))
+        record_result(result)
+        return result.render()
+
+    def run_no_throw(self, command, fetch="all", include_columns=False, **kwargs):
+        try:
+            return self.run(command, fetch, include_columns, **kwargs)
+        except (SQLGuardError, TimeoutError, duckdb.Error, SQLAlchemyError) as e:
+            return f"Error: {e}"
+
+    def get_usable_table_names(self) -> List[str]:
+        return list(self._schema_digest["tables"])
+
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        return render_schema_digest(self._schema_digest, table_names)
+
+
+class DigestSQLDatabaseToolkit(SQLDatabaseToolkit):
+    """
+    Toolkit without the LLM query-checker tool: with the schema in the prompt,
+    the extra checking round-trip is not worth its latency.
+    """
+
+    def get_tools(self):
+        return [tool for tool in super().get_tools() if not isinstance(tool, QuerySQLCheckerTool)]
+
+
+def _get_db_path() -> str:
+    return os.path.join(project_root, 'data', 'structured', 'allyin_compass.db')
+
+
+def get_schema_digest(db_path: str) -> Dict[str, Any]:
+    """
+    Returns the persisted schema digest, rebuilding (and re-persisting) it if the
+    database file changed since it was written.
+    """
+    digest = load_schema_digest(db_path)
+    if digest is not None:
+        return digest
+    print("Schema digest missing or stale; rebuilding it from DuckDB...")
+    with get_read_pool(db_path).connection() as con:
+        digest = build_schema_digest(con)
+    try:
+        return save_schema_digest(digest, db_path)
+    except OSError as e:
+        print(f"Could not persist schema digest: {e}")
+        return dict(digest, fingerprint=db_fingerprint(db_path))
+
 def get_sql_agent():
     """
     Initializes and returns a LangChain SQL agent connected to DuckDB.
     This agent can understand natural language questions and convert them
     into SQL queries to fetch data from the DuckDB database, using Google Gemini.
     """
-    script_dir = os.path.dirname(__file__)
-    project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
-    data_path = os.path.join(project_root, 'data', 'structured')
-    db_path = os.path.join(data_path, 'allyin_compass.db')
+    db_path = _get_db_path()
 
     print(f"Connecting to DuckDB for SQL retrieval at: {db_path}")
     try:
-        # Create a SQLAlchemy engine from the DuckDB connection string
-        engine = create_engine(f"duckdb:///{db_path}")
-        db = SQLDatabase(engine)
+        # The shared read-only pool (see duckdb_pool.py) backs both the guarded
+        # query path and the SQLAlchemy engine, and follows database reloads.
+        pool = get_read_pool(db_path)
+        engine = create_engine("duckdb:///", creator=lambda: ConnectionWrapper(pool.open_cursor()), poolclass=NullPool)
+        db = DigestSQLDatabase(engine, get_schema_digest(db_path), db_path, pool)
 
-        # Initialize the LLM with Google Gemini 1.5 Flash
-        # Changed model from "gemini-pro" to "gemini-1.5-flash" for better availability
-        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
+        # Shared, instrumented Gemini 1.5 Flash instance (see src/llm/llm_client.py)
+        llm = get_llm()
 
-        # Create the SQL agent with a more generic agent type
+        # Create the SQL agent with the schema digest inlined in its prompt
+        # ({table_info}/{table_names} also drop the list/schema tools)
         agent_executor = create_sql_agent(
             llm=llm,
-            db=db,
+            toolkit=DigestSQLDatabaseToolkit(db=db, llm=llm),
             agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+            prompt=PromptTemplate.from_template(SQL_DIGEST_PROMPT),
             verbose=True,
             # Removed handle_parsing_errors=True as it's no longer supported
+            # Steps are returned so the query that produced the answer can be cached
+            agent_executor_kwargs={"return_intermediate_steps": True},
         )
         print("SQL agent initialized successfully using Google Gemini.")
         return agent_executor
@@ -48,6 +173,74 @@ def get_sql_agent():
         print(f"Detailed error: {e}")
         return None
 
+QUERY_TOOL_NAME = "sql_db_query"
+
+
+def answering_sql(response: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns the SQL that produced a SQL agent answer, for the question cache:
+    the query of the run's only successful query step. None if the agent did
+    not finish with a final answer, or if it ran more than one query
+    (inspection or double-check queries), since no single query then answers
+    the question.
+    """
+    output = response.get("output")
+    if not isinstance(output, str) or output.startswith("Agent stopped due to"):
+        return None
+    queries = [(action, observation) for action, observation in response.get("intermediate_steps", [])
+               if getattr(action, "tool", None) == QUERY_TOOL_NAME]
+    if len(queries) != 1:
+        return None
+    action, observation = queries[0]
+    if isinstance(observation, str) and observation.startswith("Error:"):
+        return None
+    sql = action.tool_input.get("query") if isinstance(action.tool_input, dict) else action.tool_input
+    return sql.strip() if isinstance(sql, str) and sql.strip() else None
+
+
+def get_sql_retriever():
+    """
+    Initializes and returns a function that answers a question from the DuckDB tables.
+
+    Questions matching a query template (see sql_templates.py) are answered
+    directly with a prepared statement. A question the SQL agent has already
+    answered under the current database version reuses its SQL (and cached
+    result) without calling the LLM; everything else goes to the SQL agent.
+    """
+    db_path = _get_db_path()
+    state = {"agent": get_sql_agent(), "fingerprint": db_fingerprint(db_path) if os.path.exists(db_path) else None}
+    if state["agent"] is None:
+        return None
+
+    def retrieve_sql_answer(question: str) -> str:
+        """
+        Args:
+            question (str): The natural-language question.
+        Returns:
+            str: The answer text.
+        """
+        answer = answer_from_template(question)
+        if answer is not None:
+            return answer
+        # The agent's prompt embeds the schema digest: rebuild it if the database was reloaded.
+        fingerprint = db_fingerprint(db_path)
+        if fingerprint != state["fingerprint"]:
+            state["agent"] = get_sql_agent() or state["agent"]
+            state["fingerprint"] = fingerprint
+
+        cached_sql = lookup_question_sql(question, db_path)
+        if cached_sql is not None:
+            db = next(tool.db for tool in state["agent"].tools if hasattr(tool, "db"))
+            return f"SQL: {cached_sql}\nResult: {db.run_no_throw(cached_sql)}"
+
+        response = state["agent"].invoke({"input": question})
+        sql = answering_sql(response)
+        if sql is not None:
+            remember_question_sql(question, sql, db_path)
+        return response["output"]
+
+    return retrieve_sql_answer
+
 if __name__ == "__main__":
     sql_agent = get_sql_agent()
     if sql_agent:
@@ -0,0 +1,189 @@
+# src/retrievers/sql_templates.py
+
+import os
+import re
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.retrievers.duckdb_pool import get_read_pool
+from src.retrievers.sql_guard import GuardedResult, fetch_arrow, record_result
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Deterministic fast path for common lookups over customers / orders / products.
+# A question matching one of these shapes is answered with a prepared DuckDB
+# statement instead of a multi-step LLM SQL agent run.
+#
+# Every pattern is anchored to the whole question: a template must only answer
+# questions it fully understands, never a compound question it happens to
+# contain ("total price of product 5 across all orders" is not a price lookup).
+# ────────────────────────────────────────────────────────────────────────────────
+
+_NAME = r"([A-Za-z][A-Za-z'\-]+)\s+([A-Za-z][A-Za-z'\-]+)"
+_PRODUCT = r"product\s+(?:id\s+|number\s+|no\.?\s*|#)?P?0*(\d+)"
+_ORDER = r"order\s+(?:number\s+|no\.?\s*|id\s+|#)?(\d+)"
+_END = r"\s*[?.!]?\s*$"
+
+# Aggregates, comparisons, rankings and ranges: questions using these words
+# need the SQL agent even when they mention a single product or order.
+_NOT_A_LOOKUP = re.compile(
+    r"\b(?:total|sum|average|avg|mean|count|most|least|max(?:imum)?|min(?:imum)?|highest|lowest|"
+    r"higher|lower|cheaper|cheapest|more|less|than|compare[ds]?|comparison|versus|vs|across|all|"
+    r"each|every|per|between|after|before|since|top|bottom|rank(?:ed|ing)?)\b",
+    re.IGNORECASE,
+)
+
+
+def _format_product_price(rows: List[tuple], params: list) -> str:
+    product_id, product_name, list_price = rows[0]
+    return f"Product {product_id} ({product_name}) has a list price of ${list_price:,.2f}."
+
+
+def _format_customer_orders(rows: List[tuple], params: list) -> str:
+    first_name, last_name = rows[0][0], rows[0][1]
+    lines = [
+        f"- Order {order_id}: ordered {order_date}, status {order_status}, shipped {shipped_date or 'not yet'}"
+        for _, _, order_id, order_date, order_status, shipped_date in rows
+    ]
+    return f"{first_name} {last_name} placed {len(rows)} order(s):\n" + "\n".join(lines)
+
+
+def _format_order_customer(rows: List[tuple], params: list) -> str:
+    order_id, customer_id, first_name, last_name, email = rows[0]
+    return f"Order {order_id} was placed by customer {customer_id}, {first_name} {last_name} ({email})."
+
+
+def _format_count(noun: str) -> Callable[[List[tuple], list], str]:
+    return lambda rows, params: f"There are {rows[0][0]} {noun}."
+
+
+SQL_TEMPLATES: List[Dict[str, Any]] = [
+    {
+        "name": "product_price",
+        "pattern": re.compile(
+            r"^\s*(?:(?:what(?:'s|\s+is|\s+was)|tell\s+me|show\s+me|give\s+me|get)\s+)?(?:the\s+)?(?:list\s+)?"
+            r"(?:price|cost)\s+(?:of|for)\s+(?:the\s+)?" + _PRODUCT + _END
+            + r"|^\s*how\s+much\s+(?:does|is)\s+(?:the\s+)?" + _PRODUCT + r"(?:\s+cost)?" + _END
+            + r"|^\s*(?:what(?:'s|\s+is)\s+)?(?:the\s+)?" + _PRODUCT + r"(?:'s)?\s+(?:list\s+)?(?:price|cost)" + _END,
+            re.IGNORECASE,
+        ),
+        "sql": "SELECT product_id, product_name, list_price FROM products WHERE product_id = ?",
+        "params": lambda m: [int(next(group for group in m.groups() if group))],
+        "format": _format_product_price,
+        "empty": lambda params: f"No product with ID {params[0]} was found.",
+    },
+    {
+        "name": "order_customer",
+        "pattern": re.compile(
+            r"^\s*(?:which|what)\s+customer\s+(?:placed|made|submitted|owns|is\s+behind)\s+(?:the\s+)?" + _ORDER + _END
+            + r"|^\s*(?:which|what)\s+customer\s+(?:is|was)\s+" + _ORDER + r"\s+(?:for|from|placed\s+by)" + _END
+            + r"|^\s*(?:which|what)\s+customer\s+does\s+" + _ORDER + r"\s+belong\s+to" + _END
+            + r"|^\s*who\s+(?:placed|made|ordered|submitted)\s+(?:the\s+)?" + _ORDER + _END
+            + r"|^\s*(?:who\s+is\s+)?the\s+customer\s+(?:for|of|behind)\s+" + _ORDER + _END,
+            re.IGNORECASE,
+        ),
+        "sql": (
+            "SELECT o.order_id, c.customer_id, c.first_name, c.last_name, c.email "
+            "FROM orders o JOIN customers c ON c.customer_id = o.customer_id "
+            "WHERE o.order_id = ?"
+        ),
+        "params": lambda m: [int(next(group for group in m.groups() if group))],
+        "format": _format_order_customer,
+        "empty": lambda params: f"No order with number {params[0]} was found.",
+    },
+    {
+        "name": "customer_orders",
+        "pattern": re.compile(
+            r"\borders?(?:\s+dates?)?\s+(?:for|of|placed\s+by|made\s+by|by)\s+(?:the\s+)?customer\s+" + _NAME + r"\s*[?.!]?\s*$"
+            r"|\borders?(?:\s+dates?)?\s+(?:placed|made)\s+by\s+" + _NAME + r"\s*[?.!]?\s*$",
+            re.IGNORECASE,
+        ),
+        "sql": (
+            "SELECT c.first_name, c.last_name, o.order_id, o.order_date, o.order_status, o.shipped_date "
+            "FROM customers c JOIN orders o ON o.customer_id = c.customer_id "
+            "WHERE lower(c.first_name) = lower(?) AND lower(c.last_name) = lower(?) "
+            "ORDER BY o.order_date, o.order_id"
+        ),
+        "params": lambda m: [m.group(1) or m.group(3), m.group(2) or m.group(4)],
+        "format": _format_customer_orders,
+        # The name capture can be wrong for unusual phrasings; let the agent try.
+        "empty": None,
+    },
+    {
+        "name": "count_customers",
+        "pattern": re.compile(r"^\s*how\s+many\s+customers\s+(?:are\s+there|do\s+we\s+have)\s*[?.!]?\s*$", re.IGNORECASE),
+        "sql": "SELECT count(*) FROM customers",
+        "params": lambda m: [],
+        "format": _format_count("customers"),
+        "empty": None,
+    },
+    {
+        "name": "count_orders",
+        "pattern": re.compile(r"^\s*how\s+many\s+orders\s+(?:are\s+there|have\s+been\s+placed|do\s+we\s+have)\s*[?.!]?\s*$", re.IGNORECASE),
+        "sql": "SELECT count(*) FROM orders",
+        "params": lambda m: [],
+        "format": _format_count("orders"),
+        "empty": None,
+    },
+    {
+        "name": "count_products",
+        "pattern": re.compile(r"^\s*how\s+many\s+products\s+(?:are\s+there|do\s+we\s+have)\s*[?.!]?\s*$", re.IGNORECASE),
+        "sql": "SELECT count(*) FROM products",
+        "params": lambda m: [],
+        "format": _format_count("products"),
+        "empty": None,
+    },
+]
+
+
+def _db_path() -> str:
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    return os.path.join(project_root, 'data', 'structured', 'allyin_compass.db')
+
+
+def match_sql_template(question: str) -> Optional[Tuple[Dict[str, Any], list]]:
+    """
+    Finds the first template whose pattern matches the question.
+
+    Returns:
+        tuple: (template, params) or None if no template applies.
+    """
+    if _NOT_A_LOOKUP.search(question):
+        return None
+    for template in SQL_TEMPLATES:
+        match = template["pattern"].search(question)
+        if match:
+            return template, template["params"](match)
+    return None
+
+
+def answer_from_template(question: str) -> Optional[str]:
+    """
+    Answers a question with a parameterized query template if one matches.
+
+    Args:
+        question (str): The natural-language question.
+
+    Returns:
+        str: A deterministic answer, or None if no template applies (or the
+             template cannot answer), in which case the caller should fall back
+             to the SQL agent.
+    """
+    matched = match_sql_template(question)
+    if matched is None:
+        return None
+    template, params = matched
+    try:
+        with get_read_pool(_db_path()).connection() as cursor:
+            cursor.execute(template["sql"], params)
+            table = fetch_arrow(cursor)
+    except Exception as e:
+        logging.warning(f"SQL template '{template['name']}' failed, falling back to agent: {e}")
+        return None
+
+    if table.num_rows == 0:
+        return template["empty"](params) if template["empty"] else None
+    result = GuardedResult(template["sql"], table, table.num_rows, max_rows=table.num_rows)
+    record_result(result)
+    rows = result.rows()
+    logging.info(f"SQL template '{template['name']}' answered: {question}")
+    return template["format"](rows, params)
@@ -1,9 +1,22 @@
 # src/retrievers/vector_retriever.py
 
 import os
+import sys
+import time
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient, models
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from security.document_tags import redact_tagged
+from src.observability.metrics_registry import EMBEDDING_CALLS, EMBEDDING_LATENCY
+
+# Redact PII in retrieved passages (from the spans stored at ingest time) before
+# they are handed to the agent.
+REDACT_RETRIEVED = os.getenv("COMPASS_REDACT_RETRIEVED", "false").lower() in ("1", "true", "yes")
+
 def get_vector_retriever():
     """
     Initializes and returns a function to perform vector similarity search in Qdrant.
@@ -26,23 +39,40 @@ def get_vector_retriever():
         model = SentenceTransformer('all-MiniLM-L6-v2')
         print("Sentence Transformer model loaded for vector retrieval.")
 
-        def retrieve_vectors(query_text: str, top_k: int = 3):
+        def retrieve_vectors(query_text: str, top_k: int = 3, exclude_pii: bool = False,
+                             redact: bool = REDACT_RETRIEVED):
             """
             Performs a vector similarity search in Qdrant.
             Args:
                 query_text (str): The text query to search for.
                 top_k (int): The number of top similar results to retrieve.
+                exclude_pii (bool): Skip documents tagged with PII at ingest time.
+                redact (bool): Redact PII in the returned content using the stored spans.
             Returns:
                 list: A list of dictionaries, each representing a retrieved document
-                      with its content and metadata.
+                      with its content, metadata and ingest-time tags.
             """
             print(f"Searching Qdrant for '{query_text}' (top {top_k} results)...")
-            query_embedding = model.encode(query_text).tolist()
+            started = time.perf_counter()
+            try:
+                query_embedding = model.encode(query_text).tolist()
+            except Exception:
+                EMBEDDING_CALLS.inc(status="error")
+                raise
+            EMBEDDING_CALLS.inc(status="ok")
+            EMBEDDING_LATENCY.observe(time.perf_counter() - started)
+
+            query_filter = None
+            if exclude_pii:
+                query_filter = models.Filter(must_not=[
+                    models.FieldCondition(key="has_pii", match=models.MatchValue(value=True))
+                ])
 
             # Using client.search (this method is available in qdrant-client==1.7.0)
             search_result = client.search(
                 collection_name=collection_name,
                 query_vector=query_embedding,
+                query_filter=query_filter,
                 limit=top_k,
                 with_payload=True # Retrieve the stored metadata (original text, filename, etc.)
             )
@@ -53,13 +83,20 @@ def get_vector_retriever():
                 # 'text_content' is what was embedded, 'filename', 'type', 'id' are also there
                 # Safely get content, defaulting to empty string if None
                 content = hit.payload.get("text_content", "")
-                results.append({
+                tags = {key: hit.payload[key] for key in ("pii_spans", "pii_types", "has_pii", "compliance_terms")
+                        if key in hit.payload}
+                result = {
                     "score": hit.score,
                     "id": hit.id,
                     "filename": hit.payload.get("filename"),
                     "type": hit.payload.get("type"),
-                    "content": content # The original text
-                })
+                    "content": content, # The original text
+                    "pii_types": tags.get("pii_types", []),
+                    "compliance_terms": tags.get("compliance_terms", []),
+                }
+                if redact and content:
+                    result["content"] = redact_tagged(content, tags)
+                results.append(result)
             print(f"Found {len(results)} results.")
             return results
 
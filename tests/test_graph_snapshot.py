@@ -0,0 +1,117 @@
+# tests/test_graph_snapshot.py
+
+import os
+import sys
+
+import pytest
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.retrievers.graph_snapshot import GraphSnapshot
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Small in-memory graph; no Neo4j needed.
+#   Alice -WORKS_ON-> Apollo, Zeus      Alice -BELONGS_TO-> Engineering
+#   Bob   -WORKS_ON-> Apollo            Bob   -BELONGS_TO-> Engineering
+#   Carol -WORKS_ON-> Zeus              Carol -BELONGS_TO-> Research
+# ────────────────────────────────────────────────────────────────────────────────
+NODES = [
+    {"labels": ["Person"], "properties": {"name": "Alice", "role": "Engineer"}},     # 0
+    {"labels": ["Person"], "properties": {"name": "Bob", "role": "Engineer"}},       # 1
+    {"labels": ["Person"], "properties": {"name": "Carol", "role": "Scientist"}},    # 2
+    {"labels": ["Project"], "properties": {"name": "Apollo"}},                       # 3
+    {"labels": ["Project"], "properties": {"name": "Zeus"}},                         # 4
+    {"labels": ["Department"], "properties": {"name": "Engineering"}},               # 5
+    {"labels": ["Department"], "properties": {"name": "Research"}},                  # 6
+]
+EDGES = {
+    "WORKS_ON": [[0, 3], [0, 4], [1, 3], [2, 4]],
+    "BELONGS_TO": [[0, 5], [1, 5], [2, 6]],
+}
+
+
+@pytest.fixture
+def snapshot():
+    return GraphSnapshot(NODES, EDGES, version=3)
+
+
+def _values(records, key):
+    return sorted(record[key] for record in records)
+
+
+def test_one_hop(snapshot):
+    records = snapshot.run("MATCH (p:Person {name: 'Alice'})-[:WORKS_ON]->(j:Project) RETURN j.name")
+    assert _values(records, "j.name") == ["Apollo", "Zeus"]
+
+
+def test_two_hop(snapshot):
+    records = snapshot.run(
+        "MATCH (d:Department {name: 'Engineering'})<-[:BELONGS_TO]-(p:Person)-[:WORKS_ON]->(j:Project) "
+        "RETURN p.name, j.name"
+    )
+    assert sorted((r["p.name"], r["j.name"]) for r in records) == [
+        ("Alice", "Apollo"), ("Alice", "Zeus"), ("Bob", "Apollo"),
+    ]
+
+
+def test_two_hop_does_not_reuse_a_relationship(snapshot):
+    records = snapshot.run(
+        "MATCH (a:Person {name: 'Bob'})-[:WORKS_ON]->(j:Project)<-[:WORKS_ON]-(b:Person) RETURN b.name"
+    )
+    assert _values(records, "b.name") == ["Alice"]
+
+
+def test_reverse_direction(snapshot):
+    records = snapshot.run("MATCH (j:Project {name: 'Zeus'})<-[:WORKS_ON]-(p:Person) RETURN p.name")
+    assert _values(records, "p.name") == ["Alice", "Carol"]
+
+
+def test_where_and_parameters(snapshot):
+    records = snapshot.run(
+        "MATCH (p:Person)-[:BELONGS_TO]->(d:Department) WHERE d.name = $dept AND p.role = 'Engineer' RETURN p.name",
+        {"dept": "Engineering"},
+    )
+    assert _values(records, "p.name") == ["Alice", "Bob"]
+
+
+def test_contradictory_filters_match_nothing(snapshot):
+    assert snapshot.run("MATCH (p:Person {name: 'Alice'}) WHERE p.name = 'Bob' RETURN p.name") == []
+
+
+def test_distinct_limit_and_alias(snapshot):
+    records = snapshot.run("MATCH (p:Person)-[:WORKS_ON]->(j:Project) RETURN DISTINCT j.name AS project")
+    assert _values(records, "project") == ["Apollo", "Zeus"]
+    limited = snapshot.run("MATCH (p:Person)-[:WORKS_ON]->(j:Project) RETURN p.name AS person LIMIT 2")
+    assert len(limited) == 2 and all(set(record) == {"person"} for record in limited)
+
+
+def test_returning_a_node_gives_its_properties(snapshot):
+    assert snapshot.run("MATCH (d:Department {name: 'Research'}) RETURN d") == [{"d": {"name": "Research"}}]
+
+
+def test_max_records(snapshot):
+    assert len(snapshot.run("MATCH (p:Person) RETURN p.name", max_records=1)) == 1
+
+
+@pytest.mark.parametrize("query", [
+    "MATCH (p:Person) WHERE p.name = 'Alice' OR p.name = 'Bob' RETURN p.name",
+    "MATCH (p:Person)-[:WORKS_ON]->(j:Project) RETURN count(p)",
+    "MATCH (p:Person) RETURN p.name ORDER BY p.name",
+    "MATCH (p:Person)-[:WORKS_ON]-(j:Project) RETURN j.name",
+    "MATCH (p:Person), (j:Project) RETURN p.name, j.name",
+    "MATCH (p:Person {name: $missing}) RETURN p.name",
+])
+def test_unsupported_patterns_fall_back(snapshot, query):
+    assert snapshot.run(query) is None
+
+
+def test_save_load_round_trip(snapshot, tmp_path):
+    path = str(tmp_path / "graph" / "snapshot.json")
+    snapshot.save(path)
+    loaded = GraphSnapshot.load(path)
+    assert loaded.version == 3
+    assert loaded.stats() == snapshot.stats()
+    query = "MATCH (p:Person)-[:BELONGS_TO]->(d:Department {name: 'Engineering'}) RETURN p.name"
+    assert _values(loaded.run(query), "p.name") == _values(snapshot.run(query), "p.name") == ["Alice", "Bob"]
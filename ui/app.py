@@ -10,28 +10,85 @@ import json
 from typing import List, Dict, Optional, Any
 import glob
 import re
+from collections import OrderedDict
+import pyarrow as pa
 
 # Get the project root directory
 script_dir = os.path.dirname(__file__)
 project_root = os.path.abspath(os.path.join(script_dir, '..'))
 sys.path.append(project_root)
 
-from agents.multi_tool_agent import create_tools, create_agent, run_agent_with_logging
-from langchain_google_genai import ChatGoogleGenerativeAI
+from agents.multi_tool_agent import create_tools, create_agent, stream_agent_with_logging
+from src.llm.llm_client import get_llm
 from dotenv import load_dotenv
 from feedback.logger import log_feedback
 from security.pii_filter import redact_pii
-from security.compliance_tagger import flag_compliance_terms
-from dashboards.metrics import load_logs, calculate_queries_per_day, calculate_tool_usage, calculate_avg_response_time
+from security.compliance_tagger import find_compliance_terms
+from security.document_tags import redact_tagged, tag_text
+from dashboards.metrics import (
+    load_logs, calculate_queries_per_day, calculate_tool_usage, calculate_avg_response_time,
+    calculate_llm_usage, calculate_prompt_components, calculate_latency_percentiles, calculate_throughput,
+    calculate_error_rates, calculate_cache_hit_rates,
+)
 
 load_dotenv()
 
 logging.basicConfig(filename='ui_calls.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
-tools = create_tools(llm)
-agent = create_agent(tools, llm)
+# Streamlit re-executes this script on every interaction; the LLM client, tools
+# and agent are built once per process and shared by all sessions.
+@st.cache_resource(show_spinner="Loading agent...")
+def load_agent_resources():
+    llm = get_llm()
+    tools = create_tools(llm)
+    return llm, tools, create_agent(tools, llm)
+
+llm, tools, agent = load_agent_resources()
+
+# Answers already computed in this session, keyed by (query, domain, source), so
+# reruns (feedback clicks, sidebar changes) show them without running the agent.
+ANSWER_MEMO_SIZE = int(os.getenv("COMPASS_UI_ANSWER_MEMO_SIZE", "20"))
+
+def get_agent_response(query: str, domain: str, source: str, unstructured_data: List[Dict],
+                       answer_box) -> Dict[str, Any]:
+    memo = st.session_state.setdefault("answer_memo", OrderedDict())
+    key = (query.strip(), domain, source)
+    if key in memo:
+        memo.move_to_end(key)
+        return memo[key]
+    agent_response = stream_agent_response(answer_box, query, domain, source, unstructured_data)
+    if agent_response.get("status", "ok") == "ok":  # failures and timeouts are retried on the next rerun
+        memo[key] = agent_response
+        while len(memo) > ANSWER_MEMO_SIZE:
+            memo.popitem(last=False)
+    return agent_response
+
+def stream_agent_response(answer_box, query: str, domain: str, source: str,
+                          unstructured_data: List[Dict]) -> Dict[str, Any]:
+    """
+    Runs the agent in streaming mode, showing tool calls in a status box and the
+    answer as its tokens arrive, both inside `answer_box` (an st.empty the
+    caller then fills with the finished, highlighted answer).
+    """
+    tokens: List[str] = []
+    agent_response = None
+    with answer_box.container():
+        activity = st.status("Thinking...")
+        text = st.empty()
+    for event in stream_agent_with_logging(agent, query, domain, source, unstructured_data):
+        if event["type"] == "tool":
+            activity.update(label=f"Running {event['tool']}...")
+            activity.markdown(f"**{event['tool']}**: `{event['input']}`")
+        elif event["type"] == "observation":
+            activity.text(event["preview"])
+        elif event["type"] == "token":
+            tokens.append(event["text"])
+            text.markdown("".join(tokens) + "▌")
+        elif event["type"] == "result":
+            agent_response = event["result"]
+    activity.update(label="Done", state="complete", expanded=False)
+    return agent_response or {"answer": "".join(tokens) or "No output generated.", "status": "error"}
 
 def get_unstructured_data(source: str) -> List[Dict]:
     unstructured_data = []
@@ -47,20 +104,60 @@ def get_unstructured_data(source: str) -> List[Dict]:
         st.error(f"Error reading parsed data: {e}")
     return unstructured_data
 
-import difflib
+def highlight_text(text: str, highlights: List[Dict[str, Any]]) -> str:
+    """
+    Wraps the answer spans supported by a source (character offsets from the
+    agent's highlight alignment) in <mark> tags; overlapping spans are merged.
+    """
+    merged: List[List[int]] = []
+    for start, end in sorted((h["start"], h["end"]) for h in highlights if h.get("end", 0) > h.get("start", 0)):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    parts, position = [], 0
+    for start, end in merged:
+        parts.extend((text[position:start], "<mark>", text[start:end], "</mark>"))
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def show_result_table(result: Dict[str, Any]):
+    """
+    Shows one SQL result (an Arrow table) and, when it has one label column and
+    numeric columns, a bar chart of it. Streamlit reads the Arrow table directly.
+    """
+    table = result["table"]
+    total = result.get("total_rows")
+    shown = f"{table.num_rows} of {total}" if total and total > table.num_rows else f"{table.num_rows}"
+    with st.expander(f"Query result ({shown} rows)"):
+        st.code(result["sql"], language="sql")
+        st.dataframe(table, use_container_width=True)
+        numeric = [f.name for f in table.schema if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)
+                   or pa.types.is_decimal(f.type)]
+        labels = [f.name for f in table.schema if f.name not in numeric]
+        if table.num_rows > 1 and len(labels) == 1 and numeric:
+            st.bar_chart(table.select(labels + numeric).cast(
+                pa.schema([table.schema.field(labels[0])] + [pa.field(n, pa.float64()) for n in numeric])
+            ), x=labels[0], y=numeric)
+
 
-def highlight_text(text: str, highlights: List[Dict[str, str]]) -> str:
-    for h in highlights:
-        highlight = h.get("text")
-        if highlight:
-            # Try fuzzy match and find the closest substring in `text`
-            match = difflib.get_close_matches(highlight, [text], n=1, cutoff=0.4)
-            if match:
-                close_match = match[0]
-                # Escape original string to safely replace
-                text = text.replace(close_match, f"<mark>{close_match}</mark>")
-                print(f"[HIGHLIGHT] Applied fuzzy match: {close_match}")
-    return text
+def show_source_document(doc: Dict[str, Any]):
+    """
+    Shows a parsed source document with PII redacted. Redaction and compliance
+    flags come from the tags stored at ingest time; documents parsed before
+    tagging existed are scanned here instead.
+    """
+    stored = doc.get("tags") or {}
+    fields = [field for field in ("subject", "body", "content") if doc.get(field)]
+    tags = {field: stored.get(field) or tag_text(doc[field]) for field in fields}
+    flagged = sorted({term for field in fields for term in tags[field]["compliance_terms"]})
+    with st.expander(f"Source document: {doc.get('filename')} (PII redacted)"):
+        for field in fields:
+            st.text(redact_tagged(doc[field], tags.get(field)))
+        if flagged:
+            st.warning(f"Compliance terms in this document: {flagged}")
 
 
 def main():
@@ -106,6 +203,28 @@ def main():
             st.bar_chart(calculate_tool_usage(logs))
             st.subheader("Average Response Time")
             st.metric("Avg. Response Time (s)", f"{calculate_avg_response_time(logs):.2f}")
+            st.subheader("Latency Percentiles (s)")
+            group_by = st.selectbox("Group latency by:", ["tool", "domain", "source", "overall"])
+            st.dataframe(calculate_latency_percentiles(logs, by=None if group_by == "overall" else group_by).round(2))
+            st.subheader("Throughput (queries / hour, last 7 days)")
+            st.line_chart(calculate_throughput(logs, freq="1h", window="7D"))
+            error_rates = calculate_error_rates(logs)
+            if error_rates:
+                st.subheader("Errors and Timeouts")
+                st.metric("Error Rate", f"{error_rates['error_rate']:.1%}")
+                st.metric("Timeout Rate", f"{error_rates['timeout_rate']:.1%}")
+            cache_rates = calculate_cache_hit_rates(logs)
+            if not cache_rates.empty:
+                st.subheader("Cache Hit Rates")
+                st.dataframe(cache_rates.round({"hit_rate": 3}))
+            llm_totals = calculate_llm_usage(logs)
+            if llm_totals:
+                st.subheader("LLM Cost per Query")
+                st.metric("Avg. LLM Calls", f"{llm_totals['avg_calls']:.1f}")
+                st.metric("Avg. Tokens (prompt / completion)",
+                          f"{llm_totals['avg_prompt_tokens']:.0f} / {llm_totals['avg_completion_tokens']:.0f}")
+                st.subheader("Prompt Size by Component (chars)")
+                st.bar_chart(calculate_prompt_components(logs))
         else:
             st.info("No logs yet.")
 
@@ -120,24 +239,34 @@ def main():
             # (including the 'All' source with keyword checks)
             # now lives entirely within multi_tool_agent.py's run_agent_with_logging function.
             # Here, we just pass the selected 'source' directly.
-            agent_response = run_agent_with_logging(agent, user_query, domain, source, unstructured_data)
+            # The answer streams into answer_box; once it is complete it is replaced by the
+            # highlighted text and the tables, redaction and compliance checks below run on it.
+            answer_box = st.empty()
+            agent_response = get_agent_response(user_query, domain, source, unstructured_data, answer_box)
 
             answer = agent_response.get("answer", "")
             highlights = agent_response.get("source_highlights", [])
             highlighted_answer = highlight_text(answer, highlights) if highlights else answer
 
-            st.markdown(highlighted_answer, unsafe_allow_html=True)
+            answer_box.markdown(highlighted_answer, unsafe_allow_html=True)
+
+            for result in agent_response.get("tables", []):
+                show_result_table(result)
 
             redacted = redact_pii(answer)
             with st.expander("Redacted Answer"):
                 st.write(redacted)
 
-            flagged = flag_compliance_terms(answer)
+            # Terms from the selected domain's lexicon (every lexicon for "General")
+            flagged = sorted({f"{match.term} ({match.category})" for match in find_compliance_terms(answer, domain)})
             if flagged:
                 st.warning(f"Compliance warning: {flagged}")
             else:
                 st.info("No compliance concerns.")
 
+            for doc in unstructured_data:
+                show_source_document(doc)
+
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("👍"):